@@ -53,6 +53,11 @@ else
     SKIP_INTEGRATION_TESTS=false
 fi
 
+# Leave two cores free for the editor/foreground work while xdist shards the suite
+CPU_COUNT=$(nproc 2>/dev/null || sysctl -n hw.ncpu)
+TEST_WORKERS=${TEST_WORKERS:-$(( CPU_COUNT > 3 ? CPU_COUNT - 2 : 1 ))}
+echo "🧵 Using $TEST_WORKERS pytest-xdist workers"
+
 # Run linting first
 echo "🔍 Running code linting..."
 echo "  → Black formatting check..."
@@ -76,16 +81,16 @@ safety scan --file src/requirements.txt || echo "⚠️  Vulnerable dependencies
 # Run unit tests (mocked)
 echo "🧪 Running unit tests (mocked)..."
 echo "  → Testing app.py (SMS Handler)..."
-python -m pytest tests/test_app.py -v --cov=src.app --cov-report=term-missing
+python -m pytest tests/test_app.py -v -n "$TEST_WORKERS" --dist=worksteal --cov=src.app --cov-report=term-missing
 
 echo "  → Testing follow_up_handler.py..."
-python -m pytest tests/test_follow_up_handler.py -v --cov=src.follow_up_handler --cov-report=term-missing
+python -m pytest tests/test_follow_up_handler.py -v -n "$TEST_WORKERS" --dist=worksteal --cov=src.follow_up_handler --cov-report=term-missing
 
 echo "  → Testing outreach_handler.py..."
-python -m pytest tests/test_outreach_handler.py -v --cov=src.outreach_handler --cov-report=term-missing
+python -m pytest tests/test_outreach_handler.py -v -n "$TEST_WORKERS" --dist=worksteal --cov=src.outreach_handler --cov-report=term-missing
 
 echo "  → Testing utility modules..."
-python -m pytest tests/test_utils/ -v --cov=src.utils --cov-report=term-missing
+python -m pytest tests/test_utils/ -v -n "$TEST_WORKERS" --dist=loadfile --cov=src.utils --cov-report=term-missing
 
 # Run integration tests (real OpenAI API)
 if [ "$SKIP_INTEGRATION_TESTS" = false ]; then
@@ -108,7 +113,7 @@ fi
 
 # Generate overall coverage report
 echo "📊 Generating coverage report..."
-python -m pytest tests/ --cov=src --cov-report=html --cov-report=term
+python -m pytest tests/ -n "$TEST_WORKERS" --dist=loadfile --cov=src --cov-report=html --cov-report=term
 
 echo ""
 echo "✅ Tests completed!"
@@ -1,7 +1,7 @@
 import json
 import os
-from dotenv import load_dotenv
-from typing import Dict, Any
+from functools import lru_cache
+from typing import Dict, Any, Tuple
 
 # Import our utility classes
 from utils.supabase_client import SupabaseClient
@@ -12,8 +12,24 @@ if os.getenv("MOCK_TELNX", "0") == "0":
 else:
     from utils.telnyx_client import MockTelnyxClient as TelnyxClient
 from utils.delay_detector import DelayDetector
+from utils.logging_setup import configure_logging
 from config.follow_up_config import FOLLOW_UP_SCHEDULE
-from utils.constants import REQUIRED_FIELDS, OPTIONAL_FIELDS
+from utils.constants import (
+    REQUIRED_FIELDS,
+    OPTIONAL_FIELDS,
+    FALLBACK_MESSAGE,
+    TOUR_READY_MESSAGE,
+)
+
+configure_logging()
+
+# Fixed response bodies, serialized once per container instead of per invocation
+_EVENT_IGNORED_BODY = json.dumps({"message": "Event ignored"})
+_MISSING_MESSAGE_DATA_BODY = json.dumps({"error": "Missing required message data"})
+_AGENT_MESSAGE_IGNORED_BODY = json.dumps({"message": "Agent message ignored"})
+
+# Fields logged for the missing-fields check, joined once rather than per message
+_LEAD_INFO_FIELDS = tuple(REQUIRED_FIELDS + OPTIONAL_FIELDS)
 
 
 def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
@@ -34,7 +50,7 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         # We only care about incoming messages
         if event_type != "message.received":
             print(f"Ignoring event type: {event_type}")
-            return {"statusCode": 200, "body": json.dumps({"message": "Event ignored"})}
+            return {"statusCode": 200, "body": _EVENT_IGNORED_BODY}
 
         # Extract message details
         payload = webhook_data.get("payload", {})
@@ -46,19 +62,13 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
 
         if not from_number or not message_text:
             print("Missing required message data")
-            return {
-                "statusCode": 400,
-                "body": json.dumps({"error": "Missing required message data"}),
-            }
+            return {"statusCode": 400, "body": _MISSING_MESSAGE_DATA_BODY}
 
         # Check if this message is from the agent (ignore if so)
         agent_phone = os.getenv("AGENT_PHONE_NUMBER")
         if agent_phone and from_number == agent_phone:
             print(f"Ignoring message from agent: {from_number}")
-            return {
-                "statusCode": 200,
-                "body": json.dumps({"message": "Agent message ignored"}),
-            }
+            return {"statusCode": 200, "body": _AGENT_MESSAGE_IGNORED_BODY}
 
         # Process the lead message
         response = process_lead_message(from_number, message_text)
@@ -94,16 +104,22 @@ def _generate_delay_response(delay_info: Dict[str, Any]) -> str:
     return ai_response
 
 
+@lru_cache(maxsize=None)
+def _clients() -> Tuple[SupabaseClient, OpenAIClient, TelnyxClient, DelayDetector]:
+    """
+    Clients are built on the first message a container handles and reused by
+    its warm invocations (prompt templates and connection pools included)
+    """
+    return SupabaseClient(), OpenAIClient(), TelnyxClient(), DelayDetector()
+
+
 def process_lead_message(lead_phone: str, message: str) -> str:
     """
     Process an incoming message from a lead
     """
+    telnyx_client = None
     try:
-        # Initialize clients
-        supabase_client = SupabaseClient()
-        openai_client = OpenAIClient()
-        telnyx_client = TelnyxClient()
-        delay_detector = DelayDetector()
+        supabase_client, openai_client, telnyx_client, delay_detector = _clients()
 
         # Get or create lead record
         lead = supabase_client.get_lead_by_phone(lead_phone)
@@ -190,7 +206,7 @@ def process_lead_message(lead_phone: str, message: str) -> str:
             else:
                 print("No AGENT_PHONE_NUMBER configured - skipping agent notification")
 
-            ai_response = "Perfect! I have all the information I need. I'll get my teammate to set up an exact time with you for the tour. They'll be in touch soon."
+            ai_response = TOUR_READY_MESSAGE
             print(f"Lead {lead_phone} completed qualification - marked as tour_ready")
         
         # Check for delay requests (AFTER tour availability check to avoid false positives)
@@ -211,11 +227,14 @@ def process_lead_message(lead_phone: str, message: str) -> str:
             print(f"  missing_optional_fields: {missing_optional}")
             print(f"  needs_tour_availability: {needs_tour_availability}")
             print(f"  Current lead data for missing fields check:")
-            for field in REQUIRED_FIELDS + OPTIONAL_FIELDS:
+            for field in _LEAD_INFO_FIELDS:
                 value = lead.get(field, "EMPTY")
                 is_empty = not value or value.strip() == ""
                 print(f"    {field}: '{value}' (empty: {is_empty})")
 
+            # Conversation history lives in the messages table
+            lead["chat_history"] = supabase_client.get_chat_history(lead_phone)
+
             # Generate AI response based on phase
             ai_response = openai_client.generate_response(
                 lead, message, missing_fields, needs_tour_availability, missing_optional
@@ -252,14 +271,13 @@ def process_lead_message(lead_phone: str, message: str) -> str:
 
     except Exception as e:
         print(f"Error processing lead message: {e}")
-        # Send a fallback response
+        # Send a fallback response, with a fresh Telnyx client only if
+        # building the cached clients is what failed
         try:
-            telnyx_client = TelnyxClient()
-            fallback_message = (
-                "Thanks for your message. Our agent will follow up with you soon."
-            )
-            telnyx_client.send_sms(lead_phone, fallback_message)
-            return fallback_message
+            if telnyx_client is None:
+                telnyx_client = TelnyxClient()
+            telnyx_client.send_sms(lead_phone, FALLBACK_MESSAGE)
+            return FALLBACK_MESSAGE
         except:
             return "Error processing message"
 
@@ -284,6 +302,8 @@ if __name__ == "__main__":
 
     print("Testing locally...")
     print("Loading local .env")
+    from dotenv import load_dotenv
+
     load_dotenv()
     result = lambda_handler(test_event, None)
     print(f"Result: {result}")
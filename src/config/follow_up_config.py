@@ -7,6 +7,8 @@ FOLLOW_UP_SCHEDULE = [
     {"days": 10, "stage": "final"},
 ]
 
+# Also hard-coded in the idx_followup_due partial index predicate
+# (README_SETUP.md); recreate the index if this changes
 MAX_FOLLOW_UPS = 5
 
 # Follow-up message templates (gentle reminders)
@@ -1,15 +1,39 @@
 import json
-from typing import Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Dict, Any, Optional, Tuple
 
 # Import our utility classes
 from utils.supabase_client import SupabaseClient
-from utils.telnyx_client import TelnyxClient
+from utils.telnyx_client import MAX_CONCURRENT_SENDS, TelnyxClient
+from utils.logging_setup import configure_logging
 from config.follow_up_config import (
     FOLLOW_UP_SCHEDULE,
     FOLLOW_UP_MESSAGES,
     MAX_FOLLOW_UPS,
 )
 
+# Number of follow-ups a lead has received when each stage is sent
+_FOLLOW_UP_COUNT_BY_STAGE = {
+    "first": 0,
+    "second": 1,
+    "third": 2,
+    "fourth": 3,
+    "final": 4,
+}
+
+configure_logging()
+
+
+@lru_cache(maxsize=None)
+def _clients() -> Tuple[SupabaseClient, TelnyxClient]:
+    """
+    Clients are built on the first invocation and reused by warm invocations
+    of the same container. Building them lazily keeps configuration errors
+    inside the handler's error response instead of failing the import.
+    """
+    return SupabaseClient(), TelnyxClient()
+
 
 def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     """
@@ -17,9 +41,7 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     """
 
     try:
-        # Initialize clients
-        supabase_client = SupabaseClient()
-        telnyx_client = TelnyxClient()
+        supabase_client, telnyx_client = _clients()
 
         # Get leads that need follow-up
         leads_to_follow_up = supabase_client.get_leads_needing_follow_up()
@@ -27,21 +49,21 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         print(f"Found {len(leads_to_follow_up)} leads needing follow-up")
 
         successful_follow_ups = 0
-        failed_follow_ups = 0
-
-        for lead in leads_to_follow_up:
-            try:
-                result = process_follow_up(lead, supabase_client, telnyx_client)
-                if result:
-                    successful_follow_ups += 1
-                else:
-                    failed_follow_ups += 1
-
-            except Exception as e:
-                print(
-                    f"Error processing follow-up for {lead.get('phone', 'unknown')}: {e}"
+        if leads_to_follow_up:
+            # Leads are processed concurrently so the sends share the pooled
+            # Telnyx connection; each lead is still sent, recorded and counted
+            # on its own, so one failure can't hold back the others
+            workers = min(len(leads_to_follow_up), MAX_CONCURRENT_SENDS)
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                results = executor.map(
+                    lambda lead: _process_follow_up_safely(
+                        lead, supabase_client, telnyx_client
+                    ),
+                    leads_to_follow_up,
                 )
-                failed_follow_ups += 1
+                successful_follow_ups = sum(results)
+
+        failed_follow_ups = len(leads_to_follow_up) - successful_follow_ups
 
         return {
             "statusCode": 200,
@@ -60,6 +82,61 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         return {"statusCode": 500, "body": json.dumps({"error": str(e)})}
 
 
+def _process_follow_up_safely(
+    lead: Dict, supabase_client: SupabaseClient, telnyx_client: TelnyxClient
+) -> bool:
+    """process_follow_up, counting an error as a failed follow-up for that lead"""
+    try:
+        return process_follow_up(lead, supabase_client, telnyx_client)
+    except Exception as e:
+        print(f"Error processing follow-up for {lead.get('phone', 'unknown')}: {e}")
+        return False
+
+
+def _next_follow_up(new_count: int) -> Optional[Dict]:
+    """Schedule entry for a lead that has now received new_count follow-ups"""
+    if new_count >= MAX_FOLLOW_UPS:
+        return None
+    for follow_up in FOLLOW_UP_SCHEDULE:
+        if _FOLLOW_UP_COUNT_BY_STAGE.get(follow_up["stage"]) == new_count:
+            return follow_up
+    return None
+
+
+def render_follow_up(lead: Dict) -> str:
+    """Follow-up message for the lead's current stage"""
+    current_count = lead.get("follow_up_count") or 0
+    current_stage = lead.get("follow_up_stage", "first")
+
+    print(
+        f"Processing follow-up for {lead.get('phone')}, count: {current_count}, stage: {current_stage}"
+    )
+
+    return FOLLOW_UP_MESSAGES.get(current_stage, FOLLOW_UP_MESSAGES["first"])
+
+
+def record_follow_up(lead: Dict, supabase_client: SupabaseClient) -> None:
+    """
+    Advance the follow-up count and schedule of a lead that was just sent a
+    follow-up, in a single update
+    """
+
+    phone = lead["phone"]
+    # follow_up_count can come back as NULL; that lead hasn't had one yet
+    new_count = (lead.get("follow_up_count") or 0) + 1
+    next_follow_up = _next_follow_up(new_count)
+    if next_follow_up:
+        supabase_client.increment_follow_up_count(
+            phone, new_count, next_follow_up["days"], next_follow_up["stage"]
+        )
+        print(
+            f"Scheduled next follow-up for {phone} in {next_follow_up['days']} days (stage: {next_follow_up['stage']})"
+        )
+    else:
+        supabase_client.increment_follow_up_count(phone, new_count)
+        print(f"Reached maximum follow-ups for {phone}")
+
+
 def process_follow_up(
     lead: Dict, supabase_client: SupabaseClient, telnyx_client: TelnyxClient
 ) -> bool:
@@ -72,71 +149,21 @@ def process_follow_up(
         print("No phone number found for lead")
         return False
 
-    current_count = lead.get("follow_up_count", 0)
-    current_stage = lead.get("follow_up_stage", "first")
-
-    print(
-        f"Processing follow-up for {phone}, count: {current_count}, stage: {current_stage}"
-    )
-
-    # Get the appropriate follow-up message
-    follow_up_message = FOLLOW_UP_MESSAGES.get(
-        current_stage, FOLLOW_UP_MESSAGES["first"]
-    )
+    follow_up_message = render_follow_up(lead)
 
     # Send the follow-up message
-    success = telnyx_client.send_sms(phone, follow_up_message)
-
-    if success:
-        # Update message history
-        supabase_client.add_message_to_history(phone, follow_up_message, "ai")
-
-        # Increment follow-up count
-        supabase_client.increment_follow_up_count(phone)
-
-        # Schedule next follow-up if we haven't reached the maximum
-        new_count = current_count + 1
-        if new_count < MAX_FOLLOW_UPS:
-            # Find the next follow-up in the schedule
-            next_follow_up = None
-            for follow_up in FOLLOW_UP_SCHEDULE:
-                if follow_up["stage"] not in [
-                    "first",
-                    "second",
-                    "third",
-                    "fourth",
-                    "final",
-                ]:
-                    continue
-
-                # Map stages to count
-                stage_to_count = {
-                    "first": 0,
-                    "second": 1,
-                    "third": 2,
-                    "fourth": 3,
-                    "final": 4,
-                }
-
-                if stage_to_count.get(follow_up["stage"]) == new_count:
-                    next_follow_up = follow_up
-                    break
-
-            if next_follow_up:
-                supabase_client.schedule_follow_up(
-                    phone, next_follow_up["days"], next_follow_up["stage"]
-                )
-                print(
-                    f"Scheduled next follow-up for {phone} in {next_follow_up['days']} days (stage: {next_follow_up['stage']})"
-                )
-        else:
-            print(f"Reached maximum follow-ups for {phone}")
-
-        return True
-    else:
+    if not telnyx_client.send_sms(phone, follow_up_message):
         print(f"Failed to send follow-up message to {phone}")
         return False
 
+    # Record the message and advance the lead straight after its own send, so
+    # a later lead failing (or the run timing out) can't leave it to be
+    # messaged again on the next sweep. record_follow_up writes the count,
+    # schedule and last_contacted in a single update.
+    supabase_client.append_message(phone, "ai", follow_up_message)
+    record_follow_up(lead, supabase_client)
+    return True
+
 
 # For local testing
 if __name__ == "__main__":
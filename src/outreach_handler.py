@@ -4,10 +4,38 @@ import re
 
 from utils.supabase_client import SupabaseClient
 from utils.telnyx_client import TelnyxClient
+from utils.logging_setup import configure_logging
+
+configure_logging()
 
 supabase_client = SupabaseClient()
 telnyx_client = TelnyxClient()
 
+# Compiled once per container rather than looked up in re's cache on every call
+_NON_DIGITS = re.compile(r"\D")
+_NON_NAME_CHARS = re.compile(r"[^A-Za-z'\-]")
+
+# Initial outreach SMS; {greeting} is "Hi <first name>, " or "Hi, "
+_OUTREACH_MESSAGE = (
+    "{greeting}my name's Paloma from Cornerstone Real Estate, I saw you were looking for apartments in Boston. "
+    "To get started, what is your price range and preferred neighborhoods?"
+)
+
+# Fixed response bodies, serialized once per container instead of per invocation
+_MISSING_PHONE_NUMBER_BODY = json.dumps(
+    {"error": "Missing required field: phone_number"}
+)
+_MISSING_NAME_BODY = json.dumps({"error": "Missing required field: name"})
+_INVALID_PHONE_NUMBER_BODY = json.dumps({"error": "Invalid phone number format"})
+_PHONE_EXISTS_BODY = json.dumps(
+    {"error": "Phone number already exists in the database"}
+)
+_OUTREACH_SENT_BODY = json.dumps(
+    {"message": "Initial outreach message sent successfully"}
+)
+_OUTREACH_FAILED_BODY = json.dumps({"error": "Failed to send initial outreach message"})
+_INTERNAL_ERROR_BODY = json.dumps({"error": "Internal server error"})
+
 
 def validate_phone_number(phone: str) -> str | None:
     """
@@ -16,7 +44,7 @@ def validate_phone_number(phone: str) -> str | None:
     Always returns in +1XXXXXXXXXX format.
     Returns None if invalid.
     """
-    digits = re.sub(r"\D", "", phone)  # remove all non-digits
+    digits = _NON_DIGITS.sub("", phone)  # remove all non-digits
 
     if len(digits) == 10:  # no country code
         return "+1" + digits
@@ -64,13 +92,13 @@ def extract_first_name(full_name: str | None) -> str:
         return ""
 
     # Split on whitespace and take the first non-empty part
-    parts = [part for part in re.split(r"\s+", full_name.strip()) if part]
+    parts = full_name.split(maxsplit=1)
     if not parts:
         return ""
 
     raw_first = parts[0]
     # Keep letters plus common name punctuation (hyphen, apostrophe)
-    cleaned_first = re.sub(r"[^A-Za-z'\-]", "", raw_first)
+    cleaned_first = _NON_NAME_CHARS.sub("", raw_first)
     if not cleaned_first:
         return ""
 
@@ -86,10 +114,7 @@ def send_initial_outreach_message(lead: Dict[str, Any], phone_number: str) -> bo
         name = lead.get("name")
         first_name = extract_first_name(name)
         greeting = f"Hi {first_name}, " if first_name else "Hi, "
-        response = (
-            f"{greeting}my name's Paloma from Cornerstone Real Estate, I saw you were looking for apartments in Boston. "
-            "To get started, what is your price range and preferred neighborhoods?"
-        )
+        response = _OUTREACH_MESSAGE.format(greeting=greeting)
 
         success = telnyx_client.send_sms(phone_number, response)
         if success:
@@ -112,15 +137,9 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     try:
         # Validate input
         if not event or "phone_number" not in event:
-            return {
-                "statusCode": 400,
-                "body": json.dumps({"error": "Missing required field: phone_number"}),
-            }
+            return {"statusCode": 400, "body": _MISSING_PHONE_NUMBER_BODY}
         if not event or "name" not in event:
-            return {
-                "statusCode": 400,
-                "body": json.dumps({"error": "Missing required field: name"}),
-            }
+            return {"statusCode": 400, "body": _MISSING_NAME_BODY}
 
         phone_number = event["phone_number"]
         name = event["name"]
@@ -128,19 +147,11 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         # Validate phone number format
         normalized_phone_number = validate_phone_number(phone_number)
         if not normalized_phone_number:
-            return {
-                "statusCode": 400,
-                "body": json.dumps({"error": "Invalid phone number format"}),
-            }
+            return {"statusCode": 400, "body": _INVALID_PHONE_NUMBER_BODY}
 
         # Check if phone number already exists
         if check_if_phone_number_exists(normalized_phone_number):
-            return {
-                "statusCode": 400,
-                "body": json.dumps(
-                    {"error": "Phone number already exists in the database"}
-                ),
-            }
+            return {"statusCode": 400, "body": _PHONE_EXISTS_BODY}
 
         # Create a new lead
         lead = call_create_lead(
@@ -148,20 +159,10 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         )
 
         # Send initial outreach message
-        if send_initial_outreach_message(lead, phone_number):
-            return {
-                "statusCode": 200,
-                "body": json.dumps(
-                    {"message": "Initial outreach message sent successfully"}
-                ),
-            }
+        if send_initial_outreach_message(lead, normalized_phone_number):
+            return {"statusCode": 200, "body": _OUTREACH_SENT_BODY}
         else:
-            return {
-                "statusCode": 500,
-                "body": json.dumps(
-                    {"error": "Failed to send initial outreach message"}
-                ),
-            }
+            return {"statusCode": 500, "body": _OUTREACH_FAILED_BODY}
 
     except KeyError as e:
         print(f"Missing required field in event: {e}")
@@ -177,7 +178,4 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         }
     except Exception as e:
         print(f"Error in outreach handler: {e}")
-        return {
-            "statusCode": 500,
-            "body": json.dumps({"error": "Internal server error"}),
-        }
+        return {"statusCode": 500, "body": _INTERNAL_ERROR_BODY}
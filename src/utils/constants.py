@@ -4,6 +4,15 @@ from dataclasses import dataclass
 REQUIRED_FIELDS = ["move_in_date", "price", "beds", "baths", "location", "amenities"]
 OPTIONAL_FIELDS = ["rental_urgency", "boston_rental_experience"]
 
+# Most recent messages included in the chat history sent to OpenAI
+CHAT_HISTORY_LIMIT = 10
+
+# Sent when a reply can't be generated
+FALLBACK_MESSAGE = "Thanks for your message. Our agent will follow up with you soon."
+
+# Sent once a lead has given tour availability and is handed off to the agent
+TOUR_READY_MESSAGE = "Perfect! I have all the information I need. I'll get my teammate to set up an exact time with you for the tour. They'll be in touch soon."
+
 
 @dataclass
 class PhaseConfig:
@@ -1,12 +1,6 @@
 from datetime import datetime
-from typing import TypedDict, Optional
-from utils.openai_client import OpenAIClient
-
-
-class DelayResult(TypedDict):
-    delay_days: int
-    delay_type: str
-    original_text: str
+from typing import Optional
+from utils.openai_client import DelayResult, OpenAIClient
 
 
 class DelayDetector:
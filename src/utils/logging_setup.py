@@ -0,0 +1,8 @@
+import logging
+
+
+def configure_logging(level: int = logging.INFO) -> None:
+    """
+    Set the root logger's level; the Lambda runtime already attaches its handler
+    """
+    logging.getLogger().setLevel(level)
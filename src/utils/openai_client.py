@@ -1,9 +1,14 @@
 import os
-import openai
 from typing import Dict, List, Optional, Tuple
 
 from utils.prompt_loader import PromptLoader
-from utils.constants import PHASE_CONFIGS, REQUIRED_FIELDS, OPTIONAL_FIELDS
+from utils.constants import (
+    PHASE_CONFIGS,
+    REQUIRED_FIELDS,
+    OPTIONAL_FIELDS,
+    FALLBACK_MESSAGE,
+    CHAT_HISTORY_LIMIT,
+)
 from datetime import datetime
 from typing import TypedDict
 import json
@@ -21,6 +26,11 @@ class OpenAIClient:
         if not api_key:
             raise ValueError("Missing OPENAI_API_KEY environment variable")
 
+        # Imported here rather than at module level: the SDK is the slowest
+        # import in the package, and webhook events the handler ignores (e.g.
+        # delivery receipts) never build a client, so cold starts skip it
+        import openai
+
         self.client = openai.OpenAI(api_key=api_key)
         self.model = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
         self.prompt_loader = PromptLoader()
@@ -54,10 +64,10 @@ class OpenAIClient:
         # Include chat history for better conversational context
         chat_history = lead_data.get("chat_history", "")
         if chat_history:
-            # Limit to last 10 messages to avoid token limits
+            # Limit to last CHAT_HISTORY_LIMIT messages to avoid token limits
             chat_lines = chat_history.strip().split("\n")
-            if len(chat_lines) > 10:
-                chat_lines = chat_lines[-10:]
+            if len(chat_lines) > CHAT_HISTORY_LIMIT:
+                chat_lines = chat_lines[-CHAT_HISTORY_LIMIT:]
             chat_history_str = "\n".join(chat_lines)
         else:
             chat_history_str = "No conversation history yet"
@@ -139,7 +149,7 @@ class OpenAIClient:
 
         except Exception as e:
             print(f"Error generating OpenAI response: {e}")
-            return "Thanks for your message. Our agent will follow up with you soon."
+            return FALLBACK_MESSAGE
 
     def extract_lead_info(self, message: str, current_data: Dict) -> Dict:
         """Extract any qualification information from the message"""
@@ -1,10 +1,29 @@
+import logging
 import os
 from supabase import create_client, Client
 from typing import Dict, Optional, List
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
+
+from config.follow_up_config import MAX_FOLLOW_UPS
+from utils.constants import REQUIRED_FIELDS, OPTIONAL_FIELDS, CHAT_HISTORY_LIMIT
+
+log = logging.getLogger(__name__)
+
+
+def _mask_phone(phone: str) -> str:
+    """Last four digits of a phone number, for log messages"""
+    return f"***{phone[-4:]}" if phone else "unknown"
+
+
+def _is_blank(value) -> bool:
+    """A field is missing if it's None, empty string, or only whitespace"""
+    return value is None or (isinstance(value, str) and not value.strip())
 
 
 class SupabaseClient:
+    _REQUIRED_FIELDS = tuple(REQUIRED_FIELDS)
+    _OPTIONAL_FIELDS = tuple(OPTIONAL_FIELDS)
+
     def __init__(self):
         url = os.getenv("SUPABASE_URL")
         key = os.getenv("SUPABASE_KEY")
@@ -14,18 +33,20 @@ class SupabaseClient:
                 "Missing SUPABASE_URL or SUPABASE_KEY environment variables"
             )
         self.client: Client = create_client(url, key)
+        # Request builders only hold the session and table path, so one per
+        # table can be reused for every query instead of rebuilt per call
+        self._leads = self.client.table("leads")
+        self._messages = self.client.table("messages")
 
     def get_lead_by_phone(self, phone: str) -> Optional[Dict]:
         """Get lead record by phone number"""
         try:
-            response = (
-                self.client.table("leads").select("*").eq("phone", phone).execute()
-            )
+            response = self._leads.select("*").eq("phone", phone).execute()
             if response.data:
                 return response.data[0]
             return None
-        except Exception as e:
-            print(f"Error getting lead by phone: {e}")
+        except Exception:
+            log.exception("Error getting lead by phone %s", _mask_phone(phone))
             return None
 
     def create_lead(
@@ -33,13 +54,6 @@ class SupabaseClient:
     ) -> Optional[Dict]:  # TODO: change phone and name to hashmap of user data?
         """Create a new lead record"""
         try:
-            from datetime import datetime
-
-            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M")
-            initial_chat = (
-                f"{timestamp} - Lead: {initial_message}\n" if initial_message else ""
-            )
-
             lead_data = {
                 "phone": phone,
                 "name": name,
@@ -52,7 +66,6 @@ class SupabaseClient:
                 "amenities": "",
                 "tour_availability": "",
                 "tour_ready": False,
-                "chat_history": initial_chat,
                 "follow_up_count": 0,
                 "next_follow_up_time": None,
                 "follow_up_paused_until": None,
@@ -61,91 +74,58 @@ class SupabaseClient:
                 "rental_urgency": "",
                 "boston_rental_experience": "",
             }
-            response = self.client.table("leads").insert(lead_data).execute()
+            response = self._leads.insert(lead_data).execute()
             if response.data:
+                if initial_message:
+                    self.append_message(phone, "lead", initial_message)
                 return response.data[0]
             return None
-        except Exception as e:
-            print(f"Error creating lead: {e}")
+        except Exception:
+            log.exception("Error creating lead %s", _mask_phone(phone))
             return None
 
-    def update_lead(self, phone: str, updates: Dict) -> Optional[Dict]:
+    def update_lead(
+        self, phone: str, updates: Dict, return_row: bool = True
+    ) -> Optional[Dict]:
         """Update lead record with new information"""
         try:
             # Always update last_contacted timestamp
-            print(f"[DEBUG] Updates: {updates}")
+            log.debug("Updates: %s", updates)
             updates["last_contacted"] = "now()"
 
-            response = (
-                self.client.table("leads").update(updates).eq("phone", phone).execute()
-            )
+            # Callers that only need a success check get {} back instead of the
+            # row, or None when no lead matched. Only the phone column is
+            # returned (select=phone) to tell the two apart: with return=minimal
+            # PostgREST replies 204 and postgrest-py reports no row count.
+            if not return_row:
+                query = self._leads.update(updates).eq("phone", phone)
+                query.params = query.params.add("select", "phone")
+                response = query.execute()
+                return {} if response.data else None
+
+            response = self._leads.update(updates).eq("phone", phone).execute()
             if response.data:
                 return response.data[0]
             return None
-        except Exception as e:
-            print(f"Error updating lead: {e}")
+        except Exception:
+            log.exception("Error updating lead %s", _mask_phone(phone))
             return None
 
     def get_missing_fields(self, lead: Dict) -> List[str]:
         """Get list of REQUIRED qualification fields that are still empty for a lead"""
         # Only required fields - these must be filled for tour_ready
-        required_fields = [
-            "move_in_date",
-            "price",
-            "beds",
-            "baths",
-            "location",
-            "amenities",
-        ]
-        missing_fields = []
-
-        print(
-            f"[DEBUG] Checking missing REQUIRED fields for lead {lead.get('phone', 'unknown')}:"
-        )
-
-        for field in required_fields:
-            value = lead.get(field)
-
-            # More explicit checking: field is missing if it's None, empty string, or only whitespace
-            is_missing = value is None or (
-                isinstance(value, str) and value.strip() == ""
-            )
-
-            print(f"  {field}: '{value}' -> Missing: {is_missing}")
-
-            if is_missing:
-                missing_fields.append(field)
-
-        print(f"[DEBUG] Final missing REQUIRED fields: {missing_fields}")
-        return missing_fields
+        get = lead.get
+        return [f for f in self._REQUIRED_FIELDS if _is_blank(get(f))]
 
     def get_missing_optional_fields(self, lead: Dict) -> List[str]:
         """Get list of OPTIONAL fields that could be asked about but don't affect tour_ready"""
-        optional_fields = ["rental_urgency", "boston_rental_experience"]
-        missing_optional = []
-
-        print(
-            f"[DEBUG] Checking missing OPTIONAL fields for lead {lead.get('phone', 'unknown')}:"
-        )
-
-        for field in optional_fields:
-            value = lead.get(field)
-
-            is_missing = value is None or (
-                isinstance(value, str) and value.strip() == ""
-            )
-
-            print(f"  {field}: '{value}' -> Missing: {is_missing}")
-
-            if is_missing:
-                missing_optional.append(field)
-
-        print(f"[DEBUG] Final missing OPTIONAL fields: {missing_optional}")
-        return missing_optional
+        get = lead.get
+        return [f for f in self._OPTIONAL_FIELDS if _is_blank(get(f))]
 
     def is_qualification_complete(self, lead: Dict) -> bool:
         """Check if all qualification fields are complete"""
-        return len(self.get_missing_fields(lead)) == 0
+        get = lead.get
+        return not any(_is_blank(get(f)) for f in self._REQUIRED_FIELDS)
 
     def needs_tour_availability(self, lead: Dict) -> bool:
         """Check if tour availability is needed"""
@@ -159,36 +139,63 @@ class SupabaseClient:
         """Mark lead as tour ready"""
         try:
             updates = {"tour_ready": True, "last_contacted": "now()"}
-            result = self.update_lead(phone, updates)
+            result = self.update_lead(phone, updates, return_row=False)
             return result is not None
-        except Exception as e:
-            print(f"Error setting tour ready: {e}")
+        except Exception:
+            log.exception("Error setting tour ready for %s", _mask_phone(phone))
             return False
 
-    def add_message_to_history(self, phone: str, message: str, sender: str = "lead"):
-        """Add a message to the lead's conversation history"""
+    def append_message(self, phone: str, sender: str, body: str) -> bool:
+        """Insert a single message row for a lead"""
         try:
-            from datetime import datetime
+            message = {
+                "phone": phone,
+                "ts": datetime.now(timezone.utc).isoformat(),
+                "sender": sender,
+                "body": body,
+            }
+            self._messages.insert(message).execute()
+            return True
+        except Exception:
+            log.exception("Error appending message for %s", _mask_phone(phone))
+            return False
 
-            lead = self.get_lead_by_phone(phone)
-            if lead:
-                timestamp = datetime.now().strftime("%Y-%m-%d %H:%M")
-                existing_history = lead.get("chat_history", "")
-                sender_label = "Lead" if sender == "lead" else "AI"
-                new_entry = f"{timestamp} - {sender_label}: {message}\n"
+    def get_messages(self, phone: str, limit: int = CHAT_HISTORY_LIMIT) -> List[Dict]:
+        """Get a lead's most recent `limit` messages, oldest first"""
+        try:
+            response = (
+                self._messages.select("*")
+                .eq("phone", phone)
+                .order("ts", desc=True)
+                .limit(limit)
+                .execute()
+            )
+            return list(reversed(response.data or []))
+        except Exception:
+            log.exception("Error getting messages for %s", _mask_phone(phone))
+            return []
 
-                updated_history = existing_history + new_entry
+    def get_chat_history(self, phone: str) -> str:
+        """Render a lead's recent messages in the legacy chat_history text format"""
+        lines = []
+        for message in self.get_messages(phone):
+            # Same "YYYY-MM-DD HH24:MI" rendering as the lead_chat_history view
+            timestamp = datetime.fromisoformat(message["ts"]).strftime("%Y-%m-%d %H:%M")
+            sender_label = "Lead" if message["sender"] == "lead" else "AI"
+            lines.append(f"{timestamp} - {sender_label}: {message['body']}\n")
+        return "".join(lines)
 
-                updates = {"chat_history": updated_history, "last_contacted": "now()"}
-                self.update_lead(phone, updates)
-        except Exception as e:
-            print(f"Error adding message to history: {e}")
+    def add_message_to_history(self, phone: str, message: str, sender: str = "lead"):
+        """Add a message to the lead's conversation history"""
+        try:
+            if self.append_message(phone, sender, message):
+                self.update_lead(phone, {"last_contacted": "now()"}, return_row=False)
+        except Exception:
+            log.exception("Error adding message to history for %s", _mask_phone(phone))
 
     def schedule_follow_up(self, phone: str, days: int, stage: str) -> bool:
         """Schedule next follow-up for a lead"""
         try:
-            from datetime import datetime, timedelta
-
             next_follow_up = datetime.now() + timedelta(days=days)
 
             updates = {
@@ -196,10 +203,10 @@ class SupabaseClient:
                 "follow_up_stage": stage,
             }
 
-            result = self.update_lead(phone, updates)
+            result = self.update_lead(phone, updates, return_row=False)
             return result is not None
-        except Exception as e:
-            print(f"Error scheduling follow-up: {e}")
+        except Exception:
+            log.exception("Error scheduling follow-up for %s", _mask_phone(phone))
             return False
 
     def pause_follow_up_until(self, phone: str, until_date: datetime) -> bool:
@@ -210,74 +217,69 @@ class SupabaseClient:
                 "next_follow_up_time": None,  # Clear any scheduled follow-up
             }
 
-            result = self.update_lead(phone, updates)
+            result = self.update_lead(phone, updates, return_row=False)
             return result is not None
-        except Exception as e:
-            print(f"Error pausing follow-up: {e}")
+        except Exception:
+            log.exception("Error pausing follow-up for %s", _mask_phone(phone))
             return False
 
     def get_leads_needing_follow_up(self) -> List[Dict]:
         """Get leads that need follow-up messages"""
         try:
-            current_time = datetime.now()
+            current_time = datetime.now().isoformat()
 
             # Query for leads that:
             # - Are not tour_ready
             # - Have qualification missing
+            # - Haven't exceeded max follow-ups
             # - Have next_follow_up_time <= now
             # - Are not paused or pause period has expired
-            # - Haven't exceeded max follow-ups
-
-            response = self.client.table("leads").select("*").execute()
-
-            leads_to_follow_up = []
-            for lead in response.data:
-                # Skip if tour ready
-                if lead.get("tour_ready", False):
-                    continue
-
-                # Skip if all qualification fields are complete
-                if len(self.get_missing_fields(lead)) == 0:
-                    continue
-
-                # Skip if max follow-ups exceeded
-                if lead.get("follow_up_count", 0) >= 5:  # MAX_FOLLOW_UPS
-                    continue
-
-                # Skip if paused and pause period hasn't expired
-                if lead.get("follow_up_paused_until"):
-                    pause_until = datetime.fromisoformat(
-                        lead["follow_up_paused_until"].replace("Z", "+00:00")
-                    )
-                    if current_time < pause_until:
-                        continue
-
-                # Include if next_follow_up_time is due
-                if lead.get("next_follow_up_time"):
-                    follow_up_time = datetime.fromisoformat(
-                        lead["next_follow_up_time"].replace("Z", "+00:00")
-                    )
-                    if current_time >= follow_up_time:
-                        leads_to_follow_up.append(lead)
-
-            return leads_to_follow_up
-        except Exception as e:
-            print(f"Error getting leads for follow-up: {e}")
+            # The first four match the idx_followup_due partial index, so
+            # Postgres only scans leads that are due. tour_ready is NOT NULL
+            # (see README_SETUP.md); .eq("tour_ready", False) would skip NULLs.
+            response = (
+                self._leads.select("*")
+                .eq("tour_ready", False)
+                .eq("qualification_complete", False)
+                .lt("follow_up_count", MAX_FOLLOW_UPS)
+                .lte("next_follow_up_time", current_time)
+                .or_(
+                    "follow_up_paused_until.is.null,"
+                    f'follow_up_paused_until.lte."{current_time}"'
+                )
+                .execute()
+            )
+            return response.data or []
+        except Exception:
+            log.exception("Error getting leads for follow-up")
             return []
 
-    def increment_follow_up_count(self, phone: str) -> bool:
-        """Increment follow-up count for a lead"""
+    def increment_follow_up_count(
+        self,
+        phone: str,
+        new_count: int,
+        days: Optional[int] = None,
+        stage: Optional[str] = None,
+    ) -> bool:
+        """
+        Set a lead's follow-up count to `new_count` in one update, scheduling
+        the next follow-up in `days` days at `stage` if given (cleared otherwise)
+        """
         try:
-            lead = self.get_lead_by_phone(phone)
-            if lead:
-                new_count = lead.get("follow_up_count", 0) + 1
-                updates = {
-                    "follow_up_count": new_count,
-                    "next_follow_up_time": None,  # Clear this follow-up
-                }
-                result = self.update_lead(phone, updates)
-                return result is not None
-            return False
-        except Exception as e:
-            print(f"Error incrementing follow-up count: {e}")
+            updates = {
+                "follow_up_count": new_count,
+                "next_follow_up_time": None,  # Clear this follow-up
+            }
+            if days is not None:
+                updates["next_follow_up_time"] = (
+                    datetime.now() + timedelta(days=days)
+                ).isoformat()
+                updates["follow_up_stage"] = stage
+
+            result = self.update_lead(phone, updates, return_row=False)
+            return result is not None
+        except Exception:
+            log.exception(
+                "Error incrementing follow-up count for %s", _mask_phone(phone)
+            )
             return False
@@ -1,15 +1,26 @@
 import os
-import telnyx
-from typing import Optional
+import httpx
+
+TELNYX_MESSAGES_URL = "https://api.telnyx.com/v2/messages"
+
+# Shared across invocations of a warm Lambda container so sends reuse
+# pooled keep-alive connections instead of a fresh TLS handshake each time
+_http_client = httpx.Client(
+    http2=True,
+    limits=httpx.Limits(max_keepalive_connections=20),
+    timeout=10.0,
+)
+
+# Concurrent sends per follow-up sweep; matches the pool's keep-alive connections
+MAX_CONCURRENT_SENDS = 20
 
 
 class TelnyxClient:
     def __init__(self):
-        api_key = os.getenv("TELNYX_API_KEY")
-        if not api_key:
+        self.api_key = os.getenv("TELNYX_API_KEY")
+        if not self.api_key:
             raise ValueError("Missing TELNYX_API_KEY environment variable")
 
-        telnyx.api_key = api_key
         self.from_number = os.getenv("TELNYX_PHONE_NUMBER")
         if not self.from_number:
             raise ValueError("Missing TELNYX_PHONE_NUMBER environment variable")
@@ -17,11 +28,16 @@ class TelnyxClient:
     def send_sms(self, to_number: str, message: str) -> bool:
         """Send SMS message to a phone number"""
         try:
-            response = telnyx.Message.create(
-                from_=self.from_number, to=to_number, text=message
+            response = _http_client.post(
+                TELNYX_MESSAGES_URL,
+                headers={"Authorization": f"Bearer {self.api_key}"},
+                json={"from": self.from_number, "to": to_number, "text": message},
             )
+            response.raise_for_status()
 
-            print(f"SMS sent successfully to {to_number}: {response.id}")
+            print(
+                f"SMS sent successfully to {to_number}: {response.json()['data']['id']}"
+            )
             return True
 
         except Exception as e:
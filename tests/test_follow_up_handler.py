@@ -1,48 +1,76 @@
 import json
 import pytest
-from unittest.mock import MagicMock, patch, Mock
-import sys
-import os
-
-# Add src to path
-sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
-
-
-@patch.dict(
-    os.environ,
-    {
-        "TELNYX_API_KEY": "test_key",
-        "TELNYX_PHONE_NUMBER": "+1234567890",
-        "OPENAI_API_KEY": "test_key",
-        "SUPABASE_URL": "https://test.supabase.co",
-        "SUPABASE_KEY": "test_key",
-        "AGENT_PHONE_NUMBER": "+1987654321",
-        "OPENAI_MODEL": "gpt-4o-mini",
-    },
+import threading
+from unittest.mock import DEFAULT, call, patch
+from types import MappingProxyType
+
+from src.config.follow_up_config import FOLLOW_UP_MESSAGES
+from src.follow_up_handler import _clients, lambda_handler, process_follow_up
+
+# Leads as returned by get_leads_needing_follow_up; the handler only reads them
+FIRST_STAGE_LEAD = MappingProxyType(
+    {"phone": "+1234567890", "follow_up_count": 0, "follow_up_stage": "first"}
+)
+SECOND_STAGE_LEAD = MappingProxyType(
+    {"phone": "+1234567891", "follow_up_count": 1, "follow_up_stage": "second"}
 )
+NO_PHONE_LEAD = MappingProxyType({"follow_up_count": 0, "follow_up_stage": "first"})
+
+
+class _StubTelnyxClient:
+    """Records sent messages; process_follow_up only ever calls send_sms"""
+
+    def __init__(self, result=True):
+        self.result = result
+        self.sent = []
+
+    def send_sms(self, to_number, message):
+        self.sent.append((to_number, message))
+        return self.result
+
+
+@pytest.fixture(scope="module")
+def _handler_mocks_proto():
+    """Patch the clients constructed by the follow-up handler once for the whole module"""
+    # spec=True also specs each class's instance, so calling a method the real
+    # client doesn't have fails instead of silently returning a Mock
+    with patch.multiple(
+        "src.follow_up_handler",
+        SupabaseClient=DEFAULT,
+        TelnyxClient=DEFAULT,
+        spec=True,
+    ) as mocks:
+        yield mocks
+
+
+@pytest.fixture
+def handler_mocks(_handler_mocks_proto):
+    """Module-wide client mocks, cleared of calls and return values from earlier tests"""
+    for mock_class in _handler_mocks_proto.values():
+        # Reset the spec'd instance in place; resetting the class's return_value
+        # would swap it for a fresh, unspec'd Mock
+        mock_class.reset_mock(side_effect=True)
+        mock_class.return_value.reset_mock(return_value=True, side_effect=True)
+    # Drop clients cached by an earlier test's invocation
+    _clients.cache_clear()
+    return _handler_mocks_proto
+
+
 class TestFollowUpHandler:
 
-    @patch("src.follow_up_handler.SupabaseClient")
-    @patch("src.follow_up_handler.TelnyxClient")
-    def test_lambda_handler_success(self, mock_telnyx, mock_supabase):
+    def test_lambda_handler_success(self, handler_mocks):
         """Test successful follow-up processing"""
-        from src.follow_up_handler import lambda_handler
-
         # Setup mocks
-        mock_supabase_instance = mock_supabase.return_value
-        mock_telnyx_instance = mock_telnyx.return_value
+        mock_supabase_instance = handler_mocks["SupabaseClient"].return_value
+        mock_telnyx_instance = handler_mocks["TelnyxClient"].return_value
 
-        leads_needing_followup = [
-            {"phone": "+1234567890", "follow_up_count": 0, "follow_up_stage": "first"},
-            {"phone": "+1234567891", "follow_up_count": 1, "follow_up_stage": "second"},
-        ]
+        leads_needing_followup = [FIRST_STAGE_LEAD, SECOND_STAGE_LEAD]
 
         mock_supabase_instance.get_leads_needing_follow_up.return_value = (
             leads_needing_followup
         )
         mock_telnyx_instance.send_sms.return_value = True
         mock_supabase_instance.increment_follow_up_count.return_value = True
-        mock_supabase_instance.schedule_follow_up.return_value = True
 
         # Call the handler
         result = lambda_handler({}, None)
@@ -56,17 +84,109 @@ class TestFollowUpHandler:
         assert response_data["total_leads_processed"] == 2
 
         # Verify method calls
-        assert mock_telnyx_instance.send_sms.call_count == 2
-        assert mock_supabase_instance.increment_follow_up_count.call_count == 2
+        mock_telnyx_instance.send_sms.assert_has_calls(
+            [
+                call("+1234567890", FOLLOW_UP_MESSAGES["first"]),
+                call("+1234567891", FOLLOW_UP_MESSAGES["second"]),
+            ],
+            any_order=True,
+        )
+        mock_supabase_instance.append_message.assert_has_calls(
+            [
+                call("+1234567890", "ai", FOLLOW_UP_MESSAGES["first"]),
+                call("+1234567891", "ai", FOLLOW_UP_MESSAGES["second"]),
+            ],
+            any_order=True,
+        )
+        mock_supabase_instance.increment_follow_up_count.assert_has_calls(
+            [
+                call("+1234567890", 1, 3, "second"),
+                call("+1234567891", 2, 5, "third"),
+            ],
+            any_order=True,
+        )
 
-    @patch("src.follow_up_handler.SupabaseClient")
-    @patch("src.follow_up_handler.TelnyxClient")
-    def test_lambda_handler_no_leads(self, mock_telnyx, mock_supabase):
-        """Test when no leads need follow-up"""
-        from src.follow_up_handler import lambda_handler
+    def test_lambda_handler_records_sent_leads_when_another_fails(self, handler_mocks):
+        """A lead that errors doesn't stop the others from being recorded"""
+        mock_supabase_instance = handler_mocks["SupabaseClient"].return_value
+        mock_telnyx_instance = handler_mocks["TelnyxClient"].return_value
+        mock_supabase_instance.get_leads_needing_follow_up.return_value = [
+            FIRST_STAGE_LEAD,
+            SECOND_STAGE_LEAD,
+        ]
+
+        def send_sms(to_number, message):
+            if to_number == SECOND_STAGE_LEAD["phone"]:
+                raise RuntimeError("Telnyx unavailable")
+            return True
+
+        mock_telnyx_instance.send_sms.side_effect = send_sms
+
+        result = lambda_handler({}, None)
+
+        assert result["statusCode"] == 200
+        response_data = json.loads(result["body"])
+        assert response_data["successful_follow_ups"] == 1
+        assert response_data["failed_follow_ups"] == 1
+        mock_supabase_instance.append_message.assert_called_once_with(
+            "+1234567890", "ai", FOLLOW_UP_MESSAGES["first"]
+        )
+        mock_supabase_instance.increment_follow_up_count.assert_called_once_with(
+            "+1234567890", 1, 3, "second"
+        )
+
+    def test_lambda_handler_many_leads(self, handler_mocks):
+        """Every due lead is sent, recorded and counted"""
+        mock_supabase_instance = handler_mocks["SupabaseClient"].return_value
+        mock_telnyx_instance = handler_mocks["TelnyxClient"].return_value
+        leads = [{**FIRST_STAGE_LEAD, "phone": f"+1617555{i:04d}"} for i in range(50)]
+        mock_supabase_instance.get_leads_needing_follow_up.return_value = leads
+        mock_telnyx_instance.send_sms.return_value = True
+
+        result = lambda_handler({}, None)
+
+        assert json.loads(result["body"])["successful_follow_ups"] == 50
+        assert mock_telnyx_instance.send_sms.call_count == 50
+        assert mock_supabase_instance.append_message.call_count == 50
+        assert mock_supabase_instance.increment_follow_up_count.call_count == 50
+
+    def test_lambda_handler_sends_concurrently(self, handler_mocks):
+        """Due leads are sent in parallel over the shared Telnyx pool"""
+        mock_supabase_instance = handler_mocks["SupabaseClient"].return_value
+        mock_telnyx_instance = handler_mocks["TelnyxClient"].return_value
+        mock_supabase_instance.get_leads_needing_follow_up.return_value = [
+            FIRST_STAGE_LEAD,
+            SECOND_STAGE_LEAD,
+        ]
+
+        # Each send blocks until the other one has started; sequential sends time out
+        both_sending = threading.Barrier(2, timeout=5)
 
+        def send_sms(to_number, message):
+            both_sending.wait()
+            return True
+
+        mock_telnyx_instance.send_sms.side_effect = send_sms
+
+        result = lambda_handler({}, None)
+
+        assert json.loads(result["body"])["successful_follow_ups"] == 2
+
+    def test_lambda_handler_reuses_clients_when_warm(self, handler_mocks):
+        """Clients are built once per container, not on every invocation"""
+        mock_supabase_instance = handler_mocks["SupabaseClient"].return_value
+        mock_supabase_instance.get_leads_needing_follow_up.return_value = []
+
+        lambda_handler({}, None)
+        lambda_handler({}, None)
+
+        handler_mocks["SupabaseClient"].assert_called_once()
+        handler_mocks["TelnyxClient"].assert_called_once()
+
+    def test_lambda_handler_no_leads(self, handler_mocks):
+        """Test when no leads need follow-up"""
         # Setup mocks
-        mock_supabase_instance = mock_supabase.return_value
+        mock_supabase_instance = handler_mocks["SupabaseClient"].return_value
         mock_supabase_instance.get_leads_needing_follow_up.return_value = []
 
         # Call the handler
@@ -78,75 +198,51 @@ class TestFollowUpHandler:
         assert response_data["successful_follow_ups"] == 0
         assert response_data["total_leads_processed"] == 0
 
-    @patch("src.follow_up_handler.SupabaseClient")
-    @patch("src.follow_up_handler.TelnyxClient")
-    @patch(
-        "src.follow_up_handler.FOLLOW_UP_MESSAGES", {"first": "First follow-up message"}
-    )
-    def test_process_follow_up_success(self, mock_telnyx, mock_supabase):
+    def test_process_follow_up_success(self, handler_mocks, monkeypatch):
         """Test successful processing of a single follow-up"""
-        from src.follow_up_handler import process_follow_up
-
+        monkeypatch.setattr(
+            "src.follow_up_handler.FOLLOW_UP_MESSAGES",
+            {"first": "First follow-up message"},
+        )
         # Setup mocks
-        mock_supabase_instance = mock_supabase.return_value
-        mock_telnyx_instance = mock_telnyx.return_value
+        mock_supabase_instance = handler_mocks["SupabaseClient"].return_value
+        telnyx = _StubTelnyxClient()
 
-        lead = {
-            "phone": "+1234567890",
-            "follow_up_count": 0,
-            "follow_up_stage": "first",
-        }
-
-        mock_telnyx_instance.send_sms.return_value = True
         mock_supabase_instance.increment_follow_up_count.return_value = True
-        mock_supabase_instance.schedule_follow_up.return_value = True
 
         # Call the function
-        result = process_follow_up(lead, mock_supabase_instance, mock_telnyx_instance)
+        result = process_follow_up(FIRST_STAGE_LEAD, mock_supabase_instance, telnyx)
 
         # Assertions
         assert result is True
-        mock_telnyx_instance.send_sms.assert_called_once_with(
-            "+1234567890", "First follow-up message"
+        assert telnyx.sent == [("+1234567890", "First follow-up message")]
+        mock_supabase_instance.append_message.assert_called_once_with(
+            "+1234567890", "ai", "First follow-up message"
         )
-        mock_supabase_instance.add_message_to_history.assert_called_once()
-        mock_supabase_instance.increment_follow_up_count.assert_called_once()
+        mock_supabase_instance.increment_follow_up_count.assert_called_once_with(
+            "+1234567890", 1, 3, "second"
+        )
+        mock_supabase_instance.schedule_follow_up.assert_not_called()
 
-    @patch("src.follow_up_handler.SupabaseClient")
-    @patch("src.follow_up_handler.TelnyxClient")
-    def test_process_follow_up_sms_failure(self, mock_telnyx, mock_supabase):
+    def test_process_follow_up_sms_failure(self, handler_mocks):
         """Test follow-up processing when SMS sending fails"""
-        from src.follow_up_handler import process_follow_up
-
         # Setup mocks
-        mock_supabase_instance = mock_supabase.return_value
-        mock_telnyx_instance = mock_telnyx.return_value
-
-        lead = {
-            "phone": "+1234567890",
-            "follow_up_count": 0,
-            "follow_up_stage": "first",
-        }
-
-        mock_telnyx_instance.send_sms.return_value = False  # SMS sending fails
+        mock_supabase_instance = handler_mocks["SupabaseClient"].return_value
+        telnyx = _StubTelnyxClient(result=False)  # SMS sending fails
 
         # Call the function
-        result = process_follow_up(lead, mock_supabase_instance, mock_telnyx_instance)
+        result = process_follow_up(FIRST_STAGE_LEAD, mock_supabase_instance, telnyx)
 
         # Assertions
         assert result is False
         mock_supabase_instance.increment_follow_up_count.assert_not_called()
 
-    @patch("src.follow_up_handler.SupabaseClient")
-    @patch("src.follow_up_handler.TelnyxClient")
-    @patch("src.follow_up_handler.MAX_FOLLOW_UPS", 3)
-    def test_process_follow_up_max_reached(self, mock_telnyx, mock_supabase):
+    def test_process_follow_up_max_reached(self, handler_mocks, monkeypatch):
         """Test follow-up processing when max follow-ups is reached"""
-        from src.follow_up_handler import process_follow_up
-
+        monkeypatch.setattr("src.follow_up_handler.MAX_FOLLOW_UPS", 3)
         # Setup mocks
-        mock_supabase_instance = mock_supabase.return_value
-        mock_telnyx_instance = mock_telnyx.return_value
+        mock_supabase_instance = handler_mocks["SupabaseClient"].return_value
+        telnyx = _StubTelnyxClient()
 
         lead = {
             "phone": "+1234567890",
@@ -154,47 +250,49 @@ class TestFollowUpHandler:
             "follow_up_stage": "final",
         }
 
-        mock_telnyx_instance.send_sms.return_value = True
         mock_supabase_instance.increment_follow_up_count.return_value = True
 
         # Call the function
-        result = process_follow_up(lead, mock_supabase_instance, mock_telnyx_instance)
+        result = process_follow_up(lead, mock_supabase_instance, telnyx)
 
         # Assertions
         assert result is True
-        mock_supabase_instance.schedule_follow_up.assert_not_called()  # No next follow-up scheduled
+        # Count reaches the max with no next follow-up scheduled
+        mock_supabase_instance.increment_follow_up_count.assert_called_once_with(
+            "+1234567890", 3
+        )
 
-    def test_process_follow_up_no_phone(self):
-        """Test follow-up processing when lead has no phone number"""
-        from src.follow_up_handler import process_follow_up
+    def test_process_follow_up_null_count(self, handler_mocks):
+        """A NULL follow_up_count is treated as no follow-ups sent yet"""
+        mock_supabase_instance = handler_mocks["SupabaseClient"].return_value
+        telnyx = _StubTelnyxClient()
 
-        lead = {
-            "follow_up_count": 0,
-            "follow_up_stage": "first",
-            # Missing 'phone' field
-        }
+        lead = {**FIRST_STAGE_LEAD, "follow_up_count": None}
+
+        result = process_follow_up(lead, mock_supabase_instance, telnyx)
 
-        result = process_follow_up(lead, Mock(), Mock())
+        assert result is True
+        assert telnyx.sent == [("+1234567890", FOLLOW_UP_MESSAGES["first"])]
+        mock_supabase_instance.increment_follow_up_count.assert_called_once_with(
+            "+1234567890", 1, 3, "second"
+        )
+
+    def test_process_follow_up_no_phone(self):
+        """Test follow-up processing when lead has no phone number"""
+        result = process_follow_up(NO_PHONE_LEAD, object(), object())
 
         assert result is False
 
-    @patch("src.follow_up_handler.SupabaseClient")
-    @patch("src.follow_up_handler.TelnyxClient")
-    def test_lambda_handler_partial_failures(self, mock_telnyx, mock_supabase):
+    def test_lambda_handler_partial_failures(self, handler_mocks):
         """Test handler when some follow-ups succeed and some fail"""
-        from src.follow_up_handler import lambda_handler
-
         # Setup mocks
-        mock_supabase_instance = mock_supabase.return_value
-        mock_telnyx_instance = mock_telnyx.return_value
+        mock_supabase_instance = handler_mocks["SupabaseClient"].return_value
+        mock_telnyx_instance = handler_mocks["TelnyxClient"].return_value
 
         leads_needing_followup = [
-            {"phone": "+1234567890", "follow_up_count": 0, "follow_up_stage": "first"},
-            {"phone": "+1234567891", "follow_up_count": 1, "follow_up_stage": "second"},
-            {
-                "follow_up_count": 0,
-                "follow_up_stage": "first",
-            },  # Missing phone - will fail
+            FIRST_STAGE_LEAD,
+            SECOND_STAGE_LEAD,
+            NO_PHONE_LEAD,  # Missing phone - will fail
         ]
 
         mock_supabase_instance.get_leads_needing_follow_up.return_value = (
@@ -202,7 +300,6 @@ class TestFollowUpHandler:
         )
         mock_telnyx_instance.send_sms.return_value = True
         mock_supabase_instance.increment_follow_up_count.return_value = True
-        mock_supabase_instance.schedule_follow_up.return_value = True
 
         # Call the handler
         result = lambda_handler({}, None)
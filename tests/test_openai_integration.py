@@ -1,12 +1,7 @@
 import pytest
-import sys
-import os
 import json
 from datetime import datetime
 
-# Add src to path
-sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
-
 from src.utils.openai_client import OpenAIClient
 
 
@@ -14,9 +9,11 @@ class TestOpenAIIntegration:
     """Integration tests using real OpenAI API calls"""
 
     @pytest.fixture
-    def client(self):
+    def client(self, real_openai_api_key):
         """Initialize OpenAI client with real API key"""
-        return OpenAIClient()
+        with pytest.MonkeyPatch.context() as mp:
+            mp.setenv("OPENAI_API_KEY", real_openai_api_key)
+            return OpenAIClient()
 
     @pytest.fixture
     def sample_lead_data(self):
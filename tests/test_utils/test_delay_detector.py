@@ -1,101 +1,106 @@
 from datetime import datetime
 import pytest
-import sys
-import os
 
 from src.utils.delay_detector import DelayDetector
 
-sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "src"))
+REFERENCE_TIME = datetime(2024, 1, 1, 12, 0, 0)
 
 
-class TestDelayDetector:
-    def setup_method(self):
-        self.detector = DelayDetector()
-        self.reference_time = datetime(2024, 1, 1, 12, 0, 0)
+@pytest.fixture(scope="module")
+def detector(real_openai_api_key):
+    """DelayDetector shared by the module; it keeps no per-message state"""
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setenv("OPENAI_API_KEY", real_openai_api_key)
+        return DelayDetector()
 
-    @pytest.mark.parametrize(
-        "message, expected_days",
-        [
-            ("give me 3 days", 3),
-            ("call me in 5 days", 5),
-            ("contact me in 2 days", 2),
-            ("check back in 7 days", 7),
-            ("follow up in 1 day", 1),
-            ("reach out in 4 days", 4),
-            ("give me 2 weeks", 14),
-            ("call me in 1 week", 7),
-            ("contact me in 3 weeks", 21),
-            ("next week", 7),
-            ("in a week", 7),
-            ("give me 1 month", 30),
-            ("call me in 2 months", 60),
-            ("next month", 30),
-            ("in a month", 30),
-            ("give me two days", 2),
-            ("call me in three weeks", 21),
-            ("contact me in five days", 5),
-            ("follow up in ten weeks", 70),
-            ("a few days", 3),
-            ("a couple weeks", 14),
-        ],
-    )
-    def test_detect_delay_specific(self, message, expected_days):
-        result = self.detector.detect_delay(message, reference_time=self.reference_time)
-        print(
-            "message: ",
-            message,
-            "expected result: ",
-            expected_days,
-            "actual result: ",
-            result,
-        )
-        assert result is not None
-        # Allow 1 day tolerance due to dateparser rounding and month length variability
-        assert abs(result["delay_days"] - expected_days) <= 1
-        assert result["delay_type"] == "specific"
 
-    @pytest.mark.parametrize(
-        "message",
-        [
-            "I'm not ready yet",
-            "This is too early",
-            "I'm busy right now",
-            "Can you wait?",
-            "I'll contact you later",
-        ],
+@pytest.mark.parametrize(
+    "message, expected_days",
+    [
+        ("give me 3 days", 3),
+        ("call me in 5 days", 5),
+        ("contact me in 2 days", 2),
+        ("check back in 7 days", 7),
+        ("follow up in 1 day", 1),
+        ("reach out in 4 days", 4),
+        ("give me 2 weeks", 14),
+        ("call me in 1 week", 7),
+        ("contact me in 3 weeks", 21),
+        ("next week", 7),
+        ("in a week", 7),
+        ("give me 1 month", 30),
+        ("call me in 2 months", 60),
+        ("next month", 30),
+        ("in a month", 30),
+        ("give me two days", 2),
+        ("call me in three weeks", 21),
+        ("contact me in five days", 5),
+        ("follow up in ten weeks", 70),
+        ("a few days", 3),
+        ("a couple weeks", 14),
+    ],
+)
+def test_detect_delay_specific(detector, message, expected_days):
+    result = detector.detect_delay(message, reference_time=REFERENCE_TIME)
+    print(
+        "message: ",
+        message,
+        "expected result: ",
+        expected_days,
+        "actual result: ",
+        result,
     )
-    def test_detect_delay_default_for_no_explicit_time(self, message):
-        result = self.detector.detect_delay(message, reference_time=self.reference_time)
-        assert result is not None
-        assert result["delay_days"] == 7
-        assert result["delay_type"] == "default"
+    assert result is not None
+    # Allow 1 day tolerance due to dateparser rounding and month length variability
+    assert abs(result["delay_days"] - expected_days) <= 1
+    assert result["delay_type"] == "specific"
 
-    @pytest.mark.parametrize(
-        "message",
-        [
-            "Yes, I'm interested",
-            "That sounds great",
-            "I'm looking for apartments",
-            "What's available?",
-            "I'm ready to see some places",
-        ],
-    )
-    def test_detect_delay_none_for_no_delay(self, message):
-        # If you want strict None for no delay, modify detect_delay accordingly
-        # Currently, detect_delay always returns a dict with delay_days (default 7)
-        # If you want None, this test and method need adjustment
-        result = self.detector.detect_delay(message, reference_time=self.reference_time)
-        # Assuming default is returned for no detected time, so test for that:
-        assert result is not None
-        assert result["delay_days"] == 0
 
-    def test_detect_delay_with_reference_time(self):
-        message = "in 3 days"
-        result = self.detector.detect_delay(message, reference_time=self.reference_time)
-        assert result["delay_days"] == 3
+@pytest.mark.parametrize(
+    "message",
+    [
+        "I'm not ready yet",
+        "This is too early",
+        "I'm busy right now",
+        "Can you wait?",
+        "I'll contact you later",
+    ],
+)
+def test_detect_delay_default_for_no_explicit_time(detector, message):
+    result = detector.detect_delay(message, reference_time=REFERENCE_TIME)
+    assert result is not None
+    assert result["delay_days"] == 7
+    assert result["delay_type"] == "default"
+
+
+@pytest.mark.parametrize(
+    "message",
+    [
+        "Yes, I'm interested",
+        "That sounds great",
+        "I'm looking for apartments",
+        "What's available?",
+        "I'm ready to see some places",
+    ],
+)
+def test_detect_delay_none_for_no_delay(detector, message):
+    # If you want strict None for no delay, modify detect_delay accordingly
+    # Currently, detect_delay always returns a dict with delay_days (default 7)
+    # If you want None, this test and method need adjustment
+    result = detector.detect_delay(message, reference_time=REFERENCE_TIME)
+    # Assuming default is returned for no detected time, so test for that:
+    assert result is not None
+    assert result["delay_days"] == 0
+
+
+def test_detect_delay_with_reference_time(detector):
+    message = "in 3 days"
+    result = detector.detect_delay(message, reference_time=REFERENCE_TIME)
+    assert result["delay_days"] == 3
+
 
-    def test_detect_delay_handles_past_dates_as_zero(self):
-        # "2 days ago" should return delay_days=0, not negative
-        message = "2 days ago"
-        result = self.detector.detect_delay(message, reference_time=self.reference_time)
-        assert result["delay_days"] == 0
+def test_detect_delay_handles_past_dates_as_zero(detector):
+    # "2 days ago" should return delay_days=0, not negative
+    message = "2 days ago"
+    result = detector.detect_delay(message, reference_time=REFERENCE_TIME)
+    assert result["delay_days"] == 0
@@ -1,17 +1,49 @@
 import pytest
-from unittest.mock import patch, Mock
+from unittest.mock import MagicMock, patch
+import subprocess
 import sys
-import os
+from pathlib import Path
+from types import SimpleNamespace
 
-# Add src to path
-sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "src"))
+from src.utils.constants import FALLBACK_MESSAGE
+
+
+def _completion(content):
+    """Stand-in for a chat completion; the client only reads choices[0].message.content"""
+    return SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content=content))]
+    )
+
+
+@pytest.fixture(scope="module")
+def _openai_client_proto():
+    """OpenAIClient (and its prompt loader) built once on a patched openai.OpenAI"""
+    with patch("openai.OpenAI"):
+        from src.utils.openai_client import OpenAIClient
+
+        yield OpenAIClient()
+
+
+@pytest.fixture
+def openai_client(_openai_client_proto):
+    """Shared OpenAIClient with its API mock cleared of earlier calls and return values"""
+    _openai_client_proto.client.reset_mock(return_value=True, side_effect=True)
+    return _openai_client_proto
 
 
-@patch.dict(os.environ, {"OPENAI_API_KEY": "test_key", "OPENAI_MODEL": "gpt-4o-mini"})
 class TestOpenAIClient:
-    @patch("src.utils.openai_client.openai.OpenAI")
-    def test_init_success(self, mock_openai):
+    @pytest.fixture(autouse=True, scope="class")
+    def _env(self):
+        """Pin the OpenAI settings once for the whole class"""
+        with pytest.MonkeyPatch.context() as mp:
+            mp.setenv("OPENAI_API_KEY", "test_key")
+            mp.setenv("OPENAI_MODEL", "gpt-4o-mini")
+            yield
+
+    def test_init_success(self, monkeypatch):
         """Test successful initialization of OpenAI client"""
+        mock_openai = MagicMock()
+        monkeypatch.setattr("openai.OpenAI", mock_openai)
         from src.utils.openai_client import OpenAIClient
 
         client = OpenAIClient()
@@ -19,22 +51,18 @@ class TestOpenAIClient:
         mock_openai.assert_called_once_with(api_key="test_key")
         assert client.model == "gpt-4o-mini"
 
-    def test_init_missing_api_key(self):
+    def test_init_missing_api_key(self, monkeypatch):
         """Test initialization failure when API key is missing"""
-        with patch.dict(os.environ, {}, clear=True):
-            from src.utils.openai_client import OpenAIClient
+        monkeypatch.delenv("OPENAI_API_KEY")
+        from src.utils.openai_client import OpenAIClient
 
-            with pytest.raises(ValueError) as exc_info:
-                OpenAIClient()
+        with pytest.raises(ValueError) as exc_info:
+            OpenAIClient()
 
-            assert "Missing OPENAI_API_KEY environment variable" in str(exc_info.value)
+        assert "Missing OPENAI_API_KEY environment variable" in str(exc_info.value)
 
-    @patch("src.utils.openai_client.openai.OpenAI")
-    def test_get_database_status(self, mock_openai):
+    def test_get_database_status(self, openai_client):
         """Test database status generation"""
-        from src.utils.openai_client import OpenAIClient
-
-        client = OpenAIClient()
         lead_data = {
             "move_in_date": "2024-01-01",
             "price": "",
@@ -46,56 +74,41 @@ class TestOpenAIClient:
             "boston_rental_experience": "",
         }
 
-        status = client._get_database_status(lead_data)
+        status = openai_client._get_database_status(lead_data)
 
         assert "✓ HAS DATA" in status
         assert "✗ MISSING" in status
         assert "move_in_date: ✓ HAS DATA (2024-01-01)" in status
         assert "price: ✗ MISSING (empty)" in status
 
-    @patch("src.utils.openai_client.openai.OpenAI")
-    def test_get_chat_history(self, mock_openai):
+    def test_get_chat_history(self, openai_client):
         """Test chat history formatting"""
-        from src.utils.openai_client import OpenAIClient
-
-        client = OpenAIClient()
         lead_data = {"chat_history": "Line 1\nLine 2\nLine 3"}
 
-        history = client._get_chat_history(lead_data)
+        history = openai_client._get_chat_history(lead_data)
 
         assert history == "Line 1\nLine 2\nLine 3"
 
-    @patch("src.utils.openai_client.openai.OpenAI")
-    def test_get_chat_history_empty(self, mock_openai):
+    def test_get_chat_history_empty(self, openai_client):
         """Test chat history when empty"""
-        from src.utils.openai_client import OpenAIClient
-
-        client = OpenAIClient()
         lead_data = {}
 
-        history = client._get_chat_history(lead_data)
+        history = openai_client._get_chat_history(lead_data)
 
         assert history == "No conversation history yet"
 
-    @patch("src.utils.openai_client.openai.OpenAI")
-    def test_generate_response_success(self, mock_openai):
+    def test_generate_response_success(self, openai_client):
         """Test successful response generation"""
-        from src.utils.openai_client import OpenAIClient
-
         # Setup mock
-        mock_client = mock_openai.return_value
-        mock_response = Mock()
-        mock_response.choices = [Mock()]
-        mock_response.choices[0].message.content = "Test response"
-        mock_client.chat.completions.create.return_value = mock_response
+        mock_client = openai_client.client
+        mock_client.chat.completions.create.return_value = _completion("Test response")
 
-        client = OpenAIClient()
         lead_data = {
             "move_in_date": "2024-01-01",
             "chat_history": "Previous conversation",
         }
 
-        response = client.generate_response(
+        response = openai_client.generate_response(
             lead_data=lead_data,
             incoming_message="Test message",
             missing_fields=["price"],
@@ -105,89 +118,78 @@ class TestOpenAIClient:
         assert response == "Test response"
         mock_client.chat.completions.create.assert_called_once()
 
-    @patch("src.utils.openai_client.openai.OpenAI")
-    def test_generate_response_exception_fallback(self, mock_openai):
+    def test_generate_response_exception_fallback(self, openai_client):
         """Test response generation fallback on exception"""
-        from src.utils.openai_client import OpenAIClient
-
         # Setup mock to raise exception
-        mock_client = mock_openai.return_value
+        mock_client = openai_client.client
         mock_client.chat.completions.create.side_effect = Exception("API Error")
 
-        client = OpenAIClient()
         lead_data = {"move_in_date": "2024-01-01"}
 
-        response = client.generate_response(
+        response = openai_client.generate_response(
             lead_data=lead_data,
             incoming_message="Test message",
             missing_fields=["price"],
         )
 
-        assert (
-            response
-            == "Thanks for your message. Our agent will follow up with you soon."
-        )
+        assert response == FALLBACK_MESSAGE
 
-    @patch("src.utils.openai_client.openai.OpenAI")
-    def test_extract_lead_info_success(self, mock_openai):
+    def test_extract_lead_info_success(self, openai_client):
         """Test successful lead info extraction"""
-        from src.utils.openai_client import OpenAIClient
-
         # Setup mock
-        mock_client = mock_openai.return_value
-        mock_response = Mock()
-        mock_response.choices = [Mock()]
-        mock_response.choices[0].message.content = '{"beds": "2", "location": "Boston"}'
-        mock_client.chat.completions.create.return_value = mock_response
+        mock_client = openai_client.client
+        mock_client.chat.completions.create.return_value = _completion(
+            '{"beds": "2", "location": "Boston"}'
+        )
 
-        client = OpenAIClient()
         current_data = {"move_in_date": "2024-01-01"}
 
-        result = client.extract_lead_info(
+        result = openai_client.extract_lead_info(
             "Looking for 2 bedroom in Boston", current_data
         )
 
         assert result == {"beds": "2", "location": "Boston"}
         mock_client.chat.completions.create.assert_called_once()
 
-    @patch("src.utils.openai_client.openai.OpenAI")
-    def test_extract_lead_info_json_error(self, mock_openai):
+    def test_extract_lead_info_json_error(self, openai_client):
         """Test lead info extraction with JSON parsing error"""
-        from src.utils.openai_client import OpenAIClient
-
         # Setup mock
-        mock_client = mock_openai.return_value
-        mock_response = Mock()
-        mock_response.choices = [Mock()]
-        mock_response.choices[0].message.content = "Invalid JSON"
-        mock_client.chat.completions.create.return_value = mock_response
+        mock_client = openai_client.client
+        mock_client.chat.completions.create.return_value = _completion("Invalid JSON")
 
-        client = OpenAIClient()
         current_data = {"move_in_date": "2024-01-01"}
 
-        result = client.extract_lead_info(
+        result = openai_client.extract_lead_info(
             "Looking for 2 bedroom in Boston", current_data
         )
 
         assert result == {}
 
-    @patch("src.utils.openai_client.openai.OpenAI")
-    def test_extract_lead_info_none_content(self, mock_openai):
+    def test_extract_lead_info_none_content(self, openai_client):
         """Test lead info extraction when OpenAI returns None content"""
-        from src.utils.openai_client import OpenAIClient
-
         # Setup mock
-        mock_client = mock_openai.return_value
-        mock_response = Mock()
-        mock_response.choices = [Mock()]
-        mock_response.choices[0].message.content = None
-        mock_client.chat.completions.create.return_value = mock_response
+        mock_client = openai_client.client
+        mock_client.chat.completions.create.return_value = _completion(None)
 
-        client = OpenAIClient()
         current_data = {"move_in_date": "2024-01-01"}
 
-        result = client.extract_lead_info(
+        result = openai_client.extract_lead_info(
             "Looking for 2 bedroom in Boston", current_data
         )
 
         assert result == {}
+
+    def test_import_does_not_load_openai_sdk(self):
+        """Test that the SDK is only imported once a client is built"""
+        # Fresh interpreter: this process has already imported openai
+        src_dir = Path(__file__).resolve().parents[2] / "src"
+        check = "import sys, utils.openai_client; print('openai' in sys.modules)"
+        result = subprocess.run(
+            [sys.executable, "-c", check],
+            cwd=src_dir,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+
+        assert result.stdout.strip() == "False"
@@ -1,31 +1,38 @@
+import json
 import pytest
-from unittest.mock import MagicMock, patch, Mock
-import sys
-import os
-from datetime import datetime, timedelta
+from unittest.mock import MagicMock, Mock
 
-# Add src to path
-sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "src"))
 
-
-@patch.dict(
-    os.environ, {"SUPABASE_URL": "https://test.supabase.co", "SUPABASE_KEY": "test_key"}
-)
 class TestSupabaseClient:
 
-    @patch("src.utils.supabase_client.create_client")
-    def test_init_success(self, mock_create_client):
+    @pytest.fixture(autouse=True, scope="class")
+    def _env(self):
+        """Pin the Supabase credentials once for the whole class"""
+        with pytest.MonkeyPatch.context() as mp:
+            mp.setenv("SUPABASE_URL", "https://test.supabase.co")
+            mp.setenv("SUPABASE_KEY", "test_key")
+            yield
+
+    @pytest.fixture
+    def mock_create_client(self, monkeypatch, mock_supabase_client):
+        """Point create_client at the shared mocked Client with a plain setattr"""
+        from src.utils import supabase_client
+
+        factory = MagicMock(return_value=mock_supabase_client)
+        monkeypatch.setattr(supabase_client, "create_client", factory)
+        return factory
+
+    def test_init_success(self, mock_create_client, mock_supabase_client):
         """Test successful initialization of Supabase client"""
         from src.utils.supabase_client import SupabaseClient
 
         # Setup mock
-        mock_client = Mock()
+        mock_client = mock_supabase_client
         mock_response = Mock()
         mock_response.data = []
         mock_client.table.return_value.select.return_value.limit.return_value.execute.return_value = (
             mock_response
         )
-        mock_create_client.return_value = mock_client
 
         client = SupabaseClient()
 
@@ -34,25 +41,25 @@ class TestSupabaseClient:
         )
         assert client.client == mock_client
 
-    def test_init_missing_credentials(self):
+    def test_init_missing_credentials(self, monkeypatch):
         """Test initialization failure when credentials are missing"""
-        with patch.dict(os.environ, {}, clear=True):
-            from src.utils.supabase_client import SupabaseClient
+        monkeypatch.delenv("SUPABASE_URL")
+        monkeypatch.delenv("SUPABASE_KEY")
+        from src.utils.supabase_client import SupabaseClient
 
-            with pytest.raises(ValueError) as exc_info:
-                SupabaseClient()
+        with pytest.raises(ValueError) as exc_info:
+            SupabaseClient()
 
-            assert "Missing SUPABASE_URL or SUPABASE_KEY environment variables" in str(
-                exc_info.value
-            )
+        assert "Missing SUPABASE_URL or SUPABASE_KEY environment variables" in str(
+            exc_info.value
+        )
 
-    @patch("src.utils.supabase_client.create_client")
-    def test_get_lead_by_phone_success(self, mock_create_client):
+    def test_get_lead_by_phone_success(self, mock_create_client, mock_supabase_client):
         """Test successful lead retrieval by phone"""
         from src.utils.supabase_client import SupabaseClient
 
         # Setup mocks
-        mock_client = Mock()
+        mock_client = mock_supabase_client
         mock_response = Mock()
         mock_response.data = [{"phone": "+1234567890", "name": "John Doe"}]
         mock_client.table.return_value.select.return_value.eq.return_value.execute.return_value = (
@@ -66,20 +73,19 @@ class TestSupabaseClient:
             test_response
         )
 
-        mock_create_client.return_value = mock_client
-
         client = SupabaseClient()
         result = client.get_lead_by_phone("+1234567890")
 
         assert result == {"phone": "+1234567890", "name": "John Doe"}
 
-    @patch("src.utils.supabase_client.create_client")
-    def test_get_lead_by_phone_not_found(self, mock_create_client):
+    def test_get_lead_by_phone_not_found(
+        self, mock_create_client, mock_supabase_client
+    ):
         """Test lead retrieval when not found"""
         from src.utils.supabase_client import SupabaseClient
 
         # Setup mocks
-        mock_client = Mock()
+        mock_client = mock_supabase_client
         mock_response = Mock()
         mock_response.data = []
         mock_client.table.return_value.select.return_value.eq.return_value.execute.return_value = (
@@ -93,20 +99,17 @@ class TestSupabaseClient:
             test_response
         )
 
-        mock_create_client.return_value = mock_client
-
         client = SupabaseClient()
         result = client.get_lead_by_phone("+1234567890")
 
         assert result is None
 
-    @patch("src.utils.supabase_client.create_client")
-    def test_create_lead_success(self, mock_create_client):
+    def test_create_lead_success(self, mock_create_client, mock_supabase_client):
         """Test successful lead creation"""
         from src.utils.supabase_client import SupabaseClient
 
         # Setup mocks
-        mock_client = Mock()
+        mock_client = mock_supabase_client
         mock_response = Mock()
         mock_response.data = [{"phone": "+1234567890", "name": "John Doe"}]
         mock_client.table.return_value.insert.return_value.execute.return_value = (
@@ -120,26 +123,22 @@ class TestSupabaseClient:
             test_response
         )
 
-        mock_create_client.return_value = mock_client
-
         client = SupabaseClient()
         result = client.create_lead("+1234567890", "John Doe", "Hello")
 
         assert result == {"phone": "+1234567890", "name": "John Doe"}
 
-    @patch("src.utils.supabase_client.create_client")
-    def test_get_missing_fields(self, mock_create_client):
+    def test_get_missing_fields(self, mock_create_client, mock_supabase_client):
         """Test getting missing required fields"""
         from src.utils.supabase_client import SupabaseClient
 
         # Setup mocks
-        mock_client = Mock()
+        mock_client = mock_supabase_client
         test_response = Mock()
         test_response.data = []
         mock_client.table.return_value.select.return_value.limit.return_value.execute.return_value = (
             test_response
         )
-        mock_create_client.return_value = mock_client
 
         client = SupabaseClient()
 
@@ -162,19 +161,19 @@ class TestSupabaseClient:
         assert "beds" not in missing
         assert "location" not in missing
 
-    @patch("src.utils.supabase_client.create_client")
-    def test_get_missing_optional_fields(self, mock_create_client):
+    def test_get_missing_optional_fields(
+        self, mock_create_client, mock_supabase_client
+    ):
         """Test getting missing optional fields"""
         from src.utils.supabase_client import SupabaseClient
 
         # Setup mocks
-        mock_client = Mock()
+        mock_client = mock_supabase_client
         test_response = Mock()
         test_response.data = []
         mock_client.table.return_value.select.return_value.limit.return_value.execute.return_value = (
             test_response
         )
-        mock_create_client.return_value = mock_client
 
         client = SupabaseClient()
 
@@ -186,107 +185,230 @@ class TestSupabaseClient:
         assert "boston_rental_experience" in missing
         assert "rental_urgency" not in missing
 
-    @patch("src.utils.supabase_client.create_client")
-    def test_is_qualification_complete(self, mock_create_client):
+    def test_is_qualification_complete(
+        self, mock_create_client, mock_supabase_client, qualified_lead
+    ):
         """Test qualification completion check"""
         from src.utils.supabase_client import SupabaseClient
 
         # Setup mocks
-        mock_client = Mock()
+        mock_client = mock_supabase_client
         test_response = Mock()
         test_response.data = []
         mock_client.table.return_value.select.return_value.limit.return_value.execute.return_value = (
             test_response
         )
-        mock_create_client.return_value = mock_client
 
         client = SupabaseClient()
 
-        complete_lead = {
-            "move_in_date": "2024-01-01",
-            "price": "$2000",
-            "beds": "2",
-            "baths": "1",
-            "location": "Boston",
-            "amenities": "parking",
-        }
-
-        incomplete_lead = {
-            "move_in_date": "2024-01-01",
-            "price": "",
-            "beds": "2",
-            "baths": "1",
-            "location": "Boston",
-            "amenities": "parking",
-        }
+        incomplete_lead = {**qualified_lead, "price": ""}
 
-        assert client.is_qualification_complete(complete_lead) is True
+        assert client.is_qualification_complete(qualified_lead) is True
         assert client.is_qualification_complete(incomplete_lead) is False
 
-    @patch("src.utils.supabase_client.create_client")
-    def test_needs_tour_availability(self, mock_create_client):
+    def test_needs_tour_availability(
+        self, mock_create_client, mock_supabase_client, qualified_lead
+    ):
         """Test tour availability need check"""
         from src.utils.supabase_client import SupabaseClient
 
         # Setup mocks
-        mock_client = Mock()
+        mock_client = mock_supabase_client
         test_response = Mock()
         test_response.data = []
         mock_client.table.return_value.select.return_value.limit.return_value.execute.return_value = (
             test_response
         )
-        mock_create_client.return_value = mock_client
 
         client = SupabaseClient()
 
-        qualified_no_tour = {
-            "move_in_date": "2024-01-01",
-            "price": "$2000",
-            "beds": "2",
-            "baths": "1",
-            "location": "Boston",
-            "amenities": "parking",
-            "tour_availability": "",
-            "tour_ready": False,
-        }
-
-        qualified_with_tour = {
-            "move_in_date": "2024-01-01",
-            "price": "$2000",
-            "beds": "2",
-            "baths": "1",
-            "location": "Boston",
-            "amenities": "parking",
-            "tour_availability": "weekends",
-            "tour_ready": False,
-        }
+        qualified_with_tour = {**qualified_lead, "tour_availability": "weekends"}
 
-        assert client.needs_tour_availability(qualified_no_tour) is True
+        assert client.needs_tour_availability(qualified_lead) is True
         assert client.needs_tour_availability(qualified_with_tour) is False
 
-    @patch("src.utils.supabase_client.create_client")
-    def test_set_tour_ready(self, mock_create_client):
+    def test_set_tour_ready(self, mock_create_client, mock_supabase_client, leads_api):
         """Test setting tour ready status"""
         from src.utils.supabase_client import SupabaseClient
 
+        client = SupabaseClient()
+        requests = leads_api(client, [{"phone": "+1234567890"}])
+
+        result = client.set_tour_ready("+1234567890")
+
+        assert result is True
+        assert json.loads(requests[0].content)["tour_ready"] is True
+
+    def test_append_message(self, mock_create_client, mock_supabase_client):
+        """Test appending a message inserts a single row"""
+        from src.utils.supabase_client import SupabaseClient
+
+        # Setup mocks
+        mock_client = mock_supabase_client
+
+        client = SupabaseClient()
+        result = client.append_message("+1234567890", "lead", "Hello")
+
+        assert result is True
+        mock_client.table.assert_any_call("messages")
+        inserted = mock_client.table.return_value.insert.call_args[0][0]
+        assert inserted["phone"] == "+1234567890"
+        assert inserted["sender"] == "lead"
+        assert inserted["body"] == "Hello"
+        assert "ts" in inserted
+
+    @pytest.mark.parametrize(
+        "first_ts, second_ts",
+        [
+            ("2024-01-01T10:00:00", "2024-01-01T10:01:00"),
+            # timestamptz values as PostgREST returns them
+            ("2024-01-01T10:00:00+00:00", "2024-01-01T10:01:00.123456+00:00"),
+        ],
+        ids=["naive", "timestamptz"],
+    )
+    def test_get_chat_history(
+        self, mock_create_client, mock_supabase_client, first_ts, second_ts
+    ):
+        """Test rendering recent messages in the legacy chat history format"""
+        from src.utils.supabase_client import SupabaseClient
+
+        # Setup mocks; the query returns the newest messages first
+        mock_client = mock_supabase_client
+        mock_response = Mock()
+        mock_response.data = [
+            {"ts": second_ts, "sender": "ai", "body": "Hello!"},
+            {"ts": first_ts, "sender": "lead", "body": "Hi"},
+        ]
+        order = mock_client.table.return_value.select.return_value.eq.return_value.order
+        order.return_value.limit.return_value.execute.return_value = mock_response
+
+        client = SupabaseClient()
+        history = client.get_chat_history("+1234567890")
+
+        assert history == (
+            "2024-01-01 10:00 - Lead: Hi\n" "2024-01-01 10:01 - AI: Hello!\n"
+        )
+        order.assert_called_once_with("ts", desc=True)
+        order.return_value.limit.assert_called_once_with(10)
+
+    def test_get_leads_needing_follow_up(
+        self, mock_create_client, mock_supabase_client
+    ):
+        """Test that follow-up filtering is done in a single query"""
+        from src.utils.supabase_client import SupabaseClient
+
         # Setup mocks
-        mock_client = Mock()
+        mock_client = mock_supabase_client
         mock_response = Mock()
-        mock_response.data = [{"phone": "+1234567890", "tour_ready": True}]
-        mock_client.table.return_value.update.return_value.eq.return_value.execute.return_value = (
+        mock_response.data = [{"phone": "+1234567890"}]
+        select = mock_client.table.return_value.select.return_value
+        select.eq.return_value.eq.return_value.lt.return_value.lte.return_value.or_.return_value.execute.return_value = (
             mock_response
         )
 
-        # Mock the test query
-        test_response = Mock()
-        test_response.data = []
-        mock_client.table.return_value.select.return_value.limit.return_value.execute.return_value = (
-            test_response
+        client = SupabaseClient()
+        result = client.get_leads_needing_follow_up()
+
+        assert result == [{"phone": "+1234567890"}]
+        select.eq.assert_called_once_with("tour_ready", False)
+        select.eq.return_value.eq.assert_called_once_with(
+            "qualification_complete", False
+        )
+        select.eq.return_value.eq.return_value.lt.assert_called_once_with(
+            "follow_up_count", 5
+        )
+
+    @pytest.fixture
+    def leads_api(self):
+        """
+        Serve the leads table from canned PostgREST replies, so queries go
+        through the real postgrest-py request builder and response parsing
+        """
+        import httpx
+        from postgrest import SyncRequestBuilder
+        from postgrest.utils import SyncClient
+
+        requests = []
+
+        def install(client, rows):
+            def reply(request):
+                requests.append(request)
+                return httpx.Response(200, json=rows)
+
+            session = SyncClient(
+                base_url="https://test.supabase.co/rest/v1",
+                transport=httpx.MockTransport(reply),
+            )
+            client._leads = SyncRequestBuilder(session, "/leads")
+            return requests
+
+        return install
+
+    def test_update_lead_without_returning_row(
+        self, mock_create_client, mock_supabase_client, leads_api
+    ):
+        """Test that callers can skip having the updated row sent back"""
+        from src.utils.supabase_client import SupabaseClient
+
+        client = SupabaseClient()
+        requests = leads_api(client, [{"phone": "+1234567890"}])
+
+        result = client.update_lead("+1234567890", {"beds": "2"}, return_row=False)
+
+        assert result == {}
+        (request,) = requests
+        assert request.method == "PATCH"
+        assert request.url.params["select"] == "phone"
+        assert request.url.params["phone"] == "eq.+1234567890"
+        assert json.loads(request.content) == {
+            "beds": "2",
+            "last_contacted": "now()",
+        }
+
+    def test_update_lead_without_returning_row_no_match(
+        self, mock_create_client, mock_supabase_client, leads_api
+    ):
+        """Test that an update matching no lead is still reported as a failure"""
+        from src.utils.supabase_client import SupabaseClient
+
+        client = SupabaseClient()
+        leads_api(client, [])
+
+        assert (
+            client.update_lead("+1234567890", {"beds": "2"}, return_row=False) is None
         )
+        assert client.set_tour_ready("+1234567890") is False
 
-        mock_create_client.return_value = mock_client
+    def test_increment_follow_up_count(
+        self, mock_create_client, mock_supabase_client, leads_api
+    ):
+        """Test that the count and next follow-up are written in a single update"""
+        from src.utils.supabase_client import SupabaseClient
 
         client = SupabaseClient()
-        result = client.set_tour_ready("+1234567890")
+        requests = leads_api(client, [{"phone": "+1234567890"}])
+
+        result = client.increment_follow_up_count("+1234567890", 2, 5, "third")
 
         assert result is True
+        (request,) = requests
+        assert request.url.params["phone"] == "eq.+1234567890"
+        updates = json.loads(request.content)
+        assert updates["follow_up_count"] == 2
+        assert updates["follow_up_stage"] == "third"
+        assert updates["next_follow_up_time"] is not None
+
+    def test_increment_follow_up_count_final(
+        self, mock_create_client, mock_supabase_client, leads_api
+    ):
+        """Test that the last follow-up clears the schedule"""
+        from src.utils.supabase_client import SupabaseClient
+
+        client = SupabaseClient()
+        requests = leads_api(client, [{"phone": "+1234567890"}])
+
+        assert client.increment_follow_up_count("+1234567890", 5) is True
+        updates = json.loads(requests[0].content)
+        assert updates["follow_up_count"] == 5
+        assert updates["next_follow_up_time"] is None
+        assert "follow_up_stage" not in updates
@@ -1,119 +1,118 @@
 import pytest
-from unittest.mock import MagicMock, patch, Mock
-import sys
-import os
+from unittest.mock import patch, Mock
 
-# Add src to path
-sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "src"))
+# One stand-in for the module's shared httpx client, reused by every test
+_HTTP_CLIENT = Mock()
+
+
+@pytest.fixture
+def mock_http_client():
+    """Patch the shared httpx client with _HTTP_CLIENT, cleared of earlier calls"""
+    _HTTP_CLIENT.reset_mock(return_value=True, side_effect=True)
+    with patch("src.utils.telnyx_client._http_client", _HTTP_CLIENT):
+        yield _HTTP_CLIENT
 
 
-@patch.dict(
-    os.environ, {"TELNYX_API_KEY": "test_key", "TELNYX_PHONE_NUMBER": "+1234567890"}
-)
 class TestTelnyxClient:
 
-    @patch("src.utils.telnyx_client.telnyx")
-    def test_init_success(self, mock_telnyx):
+    @pytest.fixture(autouse=True, scope="class")
+    def _env(self):
+        """Pin the Telnyx credentials once for the whole class"""
+        with pytest.MonkeyPatch.context() as mp:
+            mp.setenv("TELNYX_API_KEY", "test_key")
+            mp.setenv("TELNYX_PHONE_NUMBER", "+1234567890")
+            yield
+
+    def test_init_success(self):
         """Test successful initialization of Telnyx client"""
         from src.utils.telnyx_client import TelnyxClient
 
         client = TelnyxClient()
 
-        assert mock_telnyx.api_key == "test_key"
+        assert client.api_key == "test_key"
         assert client.from_number == "+1234567890"
 
-    def test_init_missing_api_key(self):
-        """Test initialization failure when API key is missing"""
-        with patch.dict(os.environ, {"TELNYX_PHONE_NUMBER": "+1234567890"}, clear=True):
-            from src.utils.telnyx_client import TelnyxClient
-
-            with pytest.raises(ValueError) as exc_info:
-                TelnyxClient()
-
-            assert "Missing TELNYX_API_KEY environment variable" in str(exc_info.value)
-
-    def test_init_missing_phone_number(self):
-        """Test initialization failure when phone number is missing"""
-        with patch.dict(os.environ, {"TELNYX_API_KEY": "test_key"}, clear=True):
-            from src.utils.telnyx_client import TelnyxClient
+    @pytest.mark.parametrize("missing", ["TELNYX_API_KEY", "TELNYX_PHONE_NUMBER"])
+    def test_init_missing_env_var(self, missing, monkeypatch):
+        """Test initialization failure when a required variable is missing"""
+        monkeypatch.delenv(missing)
+        from src.utils.telnyx_client import TelnyxClient
 
-            with pytest.raises(ValueError) as exc_info:
-                TelnyxClient()
+        with pytest.raises(ValueError) as exc_info:
+            TelnyxClient()
 
-            assert "Missing TELNYX_PHONE_NUMBER environment variable" in str(
-                exc_info.value
-            )
+        assert f"Missing {missing} environment variable" in str(exc_info.value)
 
-    @patch("src.utils.telnyx_client.telnyx")
-    def test_send_sms_success(self, mock_telnyx):
+    def test_send_sms_success(self, mock_http_client):
         """Test successful SMS sending"""
-        from src.utils.telnyx_client import TelnyxClient
+        from src.utils.telnyx_client import TELNYX_MESSAGES_URL, TelnyxClient
 
         # Setup mock
-        mock_message = Mock()
-        mock_message.id = "msg_12345"
-        mock_telnyx.Message.create.return_value = mock_message
+        mock_http_client.post.return_value.json.return_value = {
+            "data": {"id": "msg_12345"}
+        }
 
         client = TelnyxClient()
         result = client.send_sms("+1987654321", "Test message")
 
         assert result is True
-        mock_telnyx.Message.create.assert_called_once_with(
-            from_="+1234567890", to="+1987654321", text="Test message"
+        mock_http_client.post.assert_called_once_with(
+            TELNYX_MESSAGES_URL,
+            headers={"Authorization": "Bearer test_key"},
+            json={"from": "+1234567890", "to": "+1987654321", "text": "Test message"},
         )
 
-    @patch("src.utils.telnyx_client.telnyx")
-    def test_send_sms_failure(self, mock_telnyx):
+    def test_send_sms_failure(self, mock_http_client):
         """Test SMS sending failure"""
         from src.utils.telnyx_client import TelnyxClient
 
         # Setup mock to raise exception
-        mock_telnyx.Message.create.side_effect = Exception("API Error")
+        mock_http_client.post.side_effect = Exception("API Error")
 
         client = TelnyxClient()
         result = client.send_sms("+1987654321", "Test message")
 
         assert result is False
 
-    @patch("src.utils.telnyx_client.telnyx")
-    def test_send_group_sms_success(self, mock_telnyx):
+    def test_send_group_sms_success(self, mock_http_client):
         """Test successful group SMS sending"""
         from src.utils.telnyx_client import TelnyxClient
 
         # Setup mock
-        mock_message = Mock()
-        mock_message.id = "msg_12345"
-        mock_telnyx.Message.create.return_value = mock_message
+        mock_http_client.post.return_value.json.return_value = {
+            "data": {"id": "msg_12345"}
+        }
 
         client = TelnyxClient()
         result = client.send_group_sms(["+1987654321", "+1987654322"], "Group message")
 
         assert result is True
-        assert mock_telnyx.Message.create.call_count == 2
+        assert mock_http_client.post.call_count == 2
 
-    @patch("src.utils.telnyx_client.telnyx")
-    def test_send_group_sms_partial_failure(self, mock_telnyx):
+    def test_send_group_sms_partial_failure(self, mock_http_client):
         """Test group SMS sending with partial failures"""
         from src.utils.telnyx_client import TelnyxClient
 
-        # Setup mock to succeed first, fail second
-        mock_message = Mock()
-        mock_message.id = "msg_12345"
-        mock_telnyx.Message.create.side_effect = [mock_message, Exception("API Error")]
+        # Setup mock to succeed for one recipient and fail for the other
+        def post(url, headers, json):
+            if json["to"] == "+1987654322":
+                raise Exception("API Error")
+            return Mock(json=Mock(return_value={"data": {"id": "msg_12345"}}))
+
+        mock_http_client.post.side_effect = post
 
         client = TelnyxClient()
         result = client.send_group_sms(["+1987654321", "+1987654322"], "Group message")
 
         assert result is True  # At least one succeeded
-        assert mock_telnyx.Message.create.call_count == 2
+        assert mock_http_client.post.call_count == 2
 
-    @patch("src.utils.telnyx_client.telnyx")
-    def test_send_group_sms_all_fail(self, mock_telnyx):
+    def test_send_group_sms_all_fail(self, mock_http_client):
         """Test group SMS sending when all fail"""
         from src.utils.telnyx_client import TelnyxClient
 
         # Setup mock to fail all calls
-        mock_telnyx.Message.create.side_effect = Exception("API Error")
+        mock_http_client.post.side_effect = Exception("API Error")
 
         client = TelnyxClient()
         result = client.send_group_sms(["+1987654321", "+1987654322"], "Group message")
@@ -123,44 +122,44 @@ class TestTelnyxClient:
 
 class TestMockTelnyxClient:
 
+    @pytest.fixture(autouse=True, scope="class")
+    def _env(self):
+        """Pin the key the mock client reads as its sender once for the whole class"""
+        with pytest.MonkeyPatch.context() as mp:
+            mp.setenv("TELNYX_API_KEY", "test_key")
+            yield
+
     def test_mock_init_success(self):
         """Test successful initialization of Mock Telnyx client"""
-        with patch.dict(os.environ, {"TELNYX_API_KEY": "test_key"}):
-            from src.utils.telnyx_client import MockTelnyxClient
+        from src.utils.telnyx_client import MockTelnyxClient
 
-            client = MockTelnyxClient()
-            assert client.from_number == "test_key"
+        client = MockTelnyxClient()
+        assert client.from_number == "test_key"
 
-    def test_mock_init_missing_phone_number(self):
+    def test_mock_init_missing_phone_number(self, monkeypatch):
         """Test Mock initialization failure when phone number is missing"""
-        with patch.dict(os.environ, {}, clear=True):
-            from src.utils.telnyx_client import MockTelnyxClient
+        monkeypatch.delenv("TELNYX_API_KEY")
+        from src.utils.telnyx_client import MockTelnyxClient
 
-            with pytest.raises(ValueError) as exc_info:
-                MockTelnyxClient()
+        with pytest.raises(ValueError) as exc_info:
+            MockTelnyxClient()
 
-            assert "Missing TELNYX_PHONE_NUMBER environment variable" in str(
-                exc_info.value
-            )
+        assert "Missing TELNYX_PHONE_NUMBER environment variable" in str(exc_info.value)
 
     def test_mock_send_sms(self):
         """Test Mock SMS sending"""
-        with patch.dict(os.environ, {"TELNYX_API_KEY": "test_key"}):
-            from src.utils.telnyx_client import MockTelnyxClient
+        from src.utils.telnyx_client import MockTelnyxClient
 
-            client = MockTelnyxClient()
-            result = client.send_sms("+1987654321", "Test message")
+        client = MockTelnyxClient()
+        result = client.send_sms("+1987654321", "Test message")
 
-            assert result is True
+        assert result is True
 
     def test_mock_send_group_sms(self):
         """Test Mock group SMS sending"""
-        with patch.dict(os.environ, {"TELNYX_API_KEY": "test_key"}):
-            from src.utils.telnyx_client import MockTelnyxClient
+        from src.utils.telnyx_client import MockTelnyxClient
 
-            client = MockTelnyxClient()
-            result = client.send_group_sms(
-                ["+1987654321", "+1987654322"], "Group message"
-            )
+        client = MockTelnyxClient()
+        result = client.send_group_sms(["+1987654321", "+1987654322"], "Group message")
 
-            assert result is True
+        assert result is True